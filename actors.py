@@ -1,9 +1,9 @@
-import pygame
-import gameworld
-from pygame import transform
-import time
-import random
-from game import Game
+import assets
+import effects
+import spawner
+
+SWING_TICKS = 1 # ticks the sword is shown for after a swing
+HIT_FLASH_TICKS = 1 # ticks a cell flashes for when something in it is hit
 
 def angle_to_dir(angle):
     """Converts an angle to left, right, up, or down
@@ -29,43 +29,110 @@ def get_rev_dir(direction):
     elif direction == 'right':
         return 'left'
 
+def cell_inset(cell_size):
+    """Get the pixels between the edge of a cell and the image in it"""
+    return cell_size // 15
+
+def sprite_size(cell_size):
+    """Get the pixels across to scale images down to for a cell size, or
+    None if the cells are big enough for the images as they are"""
+    if cell_size >= assets.SPRITE_SIZE:
+        return None
+    return max(1, cell_size - 2 * cell_inset(cell_size))
+
 class Cell():
+    __slots__ = ('draw_screen', 'coordinates', 'dimensions', 'draw_position')
+
     def __init__(self, draw_screen, coordinates, dimensions):
         self.draw_screen = draw_screen
         self.coordinates = coordinates
         self.dimensions = dimensions
+        # where actors' images go, offset so that they fit inside the cell border
+        inset = cell_inset(dimensions[0])
+        self.draw_position = (coordinates[0] + inset, coordinates[1] + inset)
 
     def draw(self):
         """Draws a cell onto the background"""
         self.draw_screen.blit(tuple(self.coordinates))
 
 class Actor():
+    is_static = True # never moves, so can be drawn once per room
+    # no __dict__, so the many npcs of a big world stay small
+    __slots__ = ('is_obstacle', 'removable', 'deadly', 'world', 'in_world', '_cell_coordinates',
+                 'last_coordinates', 'moved_tick', 'facing', 'images', 'image', 'image_rect', 'image_orig')
+
     def __init__(self, cell_coordinates, world, image_loc,
                  removable=True, deadly=False, is_obstacle=True):
         self.is_obstacle = is_obstacle # cancollide?
         self.removable = removable
         self.deadly = deadly # death on touch?
         self.world = world
+        self.in_world = False # tracked by the world's occupancy index?
         # takes coordinates as a tuple
         # if self.world._is_occupied(cell_coordinates):
         #     raise Exception('%s is already occupied!' % cell_coordinates)
-        self.cell_coordinates = cell_coordinates # sets the position of the Actor
+        self._cell_coordinates = cell_coordinates # sets the position of the Actor
+        self.last_coordinates = cell_coordinates # the position before the last move
+        self.moved_tick = -1 # the world tick of the last move
         self.facing = 0 # angle
 
-        self.image = pygame.image.load(image_loc)
+        if world.headless: # nothing is drawn, so there is no need for images
+            self.images = None
+            self.image = None
+            self.image_rect = None
+        else:
+            self.images = assets.sprites.get(image_loc, world.sprite_size, world.scale) # shared images for each facing
+            self.image = self.images[0]
+            self.image_rect = self.image.get_rect()
         self.image_orig = self.image # an original image to base off of that does not rotate
-        self.image_rect = self.image.get_rect()
 
+    @property
+    def cell_coordinates(self):
+        """The cell the actor is in"""
+        return self._cell_coordinates
 
-    def draw(self):
+    @cell_coordinates.setter
+    def cell_coordinates(self, cell_coordinates):
+        """Move the actor to a cell, keeping the occupancy index in step"""
+        if self.in_world:
+            world = self.world
+            old_coordinates = self._cell_coordinates
+            world.occupancy.move(self, old_coordinates, cell_coordinates)
+            self.last_coordinates = old_coordinates # drawn moving from here until the next tick
+            self.moved_tick = world.ticks
+            self._cell_coordinates = cell_coordinates
+            if world.grid_state is not None: # vectorized grunts look for it in the arrays
+                if world._is_in_grid(old_coordinates):
+                    world.grid_state.update_cell(old_coordinates)
+                if world._is_in_grid(cell_coordinates):
+                    world.grid_state.update_cell(cell_coordinates)
+            return
+        self._cell_coordinates = cell_coordinates
+
+    def draw(self, surface=None, alpha=1.0, origin=None):
+        """Draws the actor onto a surface, the screen by default. Returns
+        the area that was drawn.
+
+        alpha: how far through the time between ticks to draw, an actor
+            that moved on the last tick is drawn part of the way there
+        origin: the pixel position of the top left of the surface in the
+            world, ie where a camera is looking"""
         cells = self.world.cells
-        cell = cells[tuple(self.cell_coordinates)]
-        # add an offset so that the image will fit inside the cell border
-        x_y_coords = self.world._add_coords(cell.coordinates, (3, 3))
-        rect_dim = (self.image_rect.width, self.image_rect.height)
-        self.image_rect = pygame.Rect(x_y_coords, rect_dim)
-        screen = self.world.screen
-        screen.blit(self.image, self.image_rect)
+        rect = self.image_rect # moved rather than replaced every frame
+        if alpha < 1 and self.moved_tick == self.world.ticks: # still moving from the last cell
+            x, y = cells[self.cell_coordinates].draw_position
+            last_x, last_y = cells[self.last_coordinates].draw_position
+            rect.x = last_x + int((x - last_x) * alpha)
+            rect.y = last_y + int((y - last_y) * alpha)
+        else:
+            rect.topleft = cells[self.cell_coordinates].draw_position
+        if origin is not None:
+            rect.x -= origin[0]
+            rect.y -= origin[1]
+        if surface is None:
+            surface = self.world.screen
+        surface.blit(self.image, rect)
+        return rect
 
     def is_valid(self, coord):
         """Checks if the space the player wants to move to can be moved to
@@ -96,41 +163,47 @@ class Actor():
             if self.facing == 0: # if already facing up
                 new_coord = self.next_space('up')
             else: # if not facing up, rotate up
-                new_image = transform.rotate(self.image_orig, 0)
                 new_facing = 0
         elif direction == 'left':
             if self.facing == 90: # if already facing left
                 new_coord = self.next_space('left')
             else: # if not facing left, rotate left
-                new_image = transform.rotate(self.image_orig, 90)
                 new_facing = 90
         elif direction == 'down':
             if self.facing == 180: # if already facing down
                 new_coord = self.next_space('down')
             else: # if not facing down, rotate down
-                new_image = transform.rotate(self.image_orig, 180)
                 new_facing = 180
         elif direction == 'right':
             if self.facing == 270: # if already facing right
                 new_coord = self.next_space('right')
             else: # if not facing right, rotate right
-                new_image = transform.rotate(self.image_orig, 270)
                 new_facing = 270
         if self.world.cleared == True:
-            if new_coord == self.world.open_door.cell_coordinates:
+            if new_coord == self.world.door_position: # walk out through the open door
                 self.cell_coordinates = new_coord
         if new_coord != self.cell_coordinates and self.is_valid(new_coord): # if the coord changed and is valid
                 self.cell_coordinates = new_coord
         else:
             try:
-                self.image = new_image
-                self.facing = new_facing
+                self.turn(new_facing)
             except UnboundLocalError: # if the item has not moved or rotated
                 pass # ie no new image
 
+    def turn(self, facing):
+        """Turns the actor to face an angle
+
+        facing: the angle to face"""
+        self.facing = facing
+        if self.images is not None: # headless actors have no images
+            self.image = self.images[facing]
+
 
 class Player(Actor):
     """Creates the Player to place on the map"""
+    is_static = False
+    __slots__ = ('cells', 'sword')
+
     def __init__(self, initial_coordinates, world, image_location):
         """Initialize the Player.
         initial_coordinates: the starting coordinates for the player
@@ -139,6 +212,7 @@ class Player(Actor):
         super(Player, self).__init__(
             initial_coordinates, world, image_location, removable=False, is_obstacle=False) # uses the __init__ method from Actor()
         self.cells = world.cells
+        self.sword = None # the last sword swung
         self.image_orig = self.image # an original image to base off of that does not rotate
 
     def action(self, act):
@@ -148,12 +222,14 @@ class Player(Actor):
 
 class Sword(Actor):
     """Sword object to attack"""
+    is_static = False
+    __slots__ = ()
 
     def __init__(self, player, world, image_location = './images/sword.jpg'):
         """Initialize the sword object"""
         super(Sword, self).__init__(
             player.cell_coordinates, world, image_location, removable=True, is_obstacle=False) # uses the __init__ method from Actor()
-        self.facing = player.facing
+        self.turn(player.facing)
         self._get_coordinates()
         self._swing()
 
@@ -161,38 +237,34 @@ class Sword(Actor):
         """Find the space immediately in front of the player to swing in"""
         if self.facing == 0:
             self.cell_coordinates = (self.cell_coordinates[0], self.cell_coordinates[1] - 1)
-            self.image = transform.rotate(self.image_orig, 0)
         elif self.facing == 180:
             self.cell_coordinates = (self.cell_coordinates[0], self.cell_coordinates[1] + 1)
-            self.image = transform.rotate(self.image_orig, 180)
         elif self.facing == 90:
             self.cell_coordinates = (self.cell_coordinates[0] - 1, self.cell_coordinates[1])
-            self.image = transform.rotate(self.image_orig, 90)
         elif self.facing == 270:
             self.cell_coordinates = (self.cell_coordinates[0] + 1, self.cell_coordinates[1])
-            self.image = transform.rotate(self.image_orig, 270)
 
     def _swing(self):
-        """Check if the sword hits an npc"""
-        self.world.actors.append((self, self.cell_coordinates))
-
-        gameworld.Update(self.world)._redraw() # draw the sword
-        # time.sleep(.5) # how long to swing
-        self.world.actors.remove((self, self.cell_coordinates))
-
-        pos = self.cell_coordinates # get the position of the coord in the list
-        for actor in self.world.actors:
-            if actor[1] == pos:
-                if actor[0].removable == True:
-                    actor[0].health += -1 # remove one health, only exists if the item is removable
-                    if actor[0].health <= 0: # if dead
-                        #del self.world.actors_position[pos] # get rid of the swing from the list of actors
-                        self.world.actors.remove(actor)
+        """Check if the sword hits an npc, and show the swing until the
+        next tick"""
+        pos = self.cell_coordinates # the cell the sword is swung into
+        if self.world._is_in_grid(pos): # not out through the door
+            self.world.effects.add(effects.Actor_Effect(self, SWING_TICKS)) # drawn with the next frames
+        for actor in list(self.world.actors_at(pos)): # copy, dead actors leave the cell
+            if actor.removable == True:
+                actor.health += -1 # remove one health, only exists if the item is removable
+                self.world.effects.add(effects.Flash_Effect(pos, HIT_FLASH_TICKS))
+                if actor.health <= 0: # if dead
+                    self.world.remove_actor(actor)
+                    spawner.pool.release(actor) # spawned again in a later room
         #actor = self.world.actors[pos] # get the actor that is at that coord
 
 
 class Npc(Actor):
     """Creates an NPC to place in the world"""
+    is_static = False
+    __slots__ = ('health', 'acted_tick')
+
     def __init__(self, initial_coordinates, world, image_location, health = 2):
         """Initialize the NPC.
         initial_coordinates: the starting coordinates for the NPC
@@ -202,19 +274,29 @@ class Npc(Actor):
         super(Npc, self).__init__(
             initial_coordinates, world, image_location, removable=True, deadly=True, is_obstacle=True) # uses the __init__ method from Player()
         self.health = health
+        self.acted_tick = -1 # the world tick it last acted on, so it never acts twice in one
+
+    def sees_player(self):
+        """Checks if the player is in sight, from the world's shared
+        visibility map, so it costs a lookup rather than a raycast"""
+        return self.world.visibility.can_see(self.cell_coordinates)
 
 class Grunt(Npc):
     """Basic NPC that walks back and forth until it hits an obstacle,
     then it turns around and walks back to its starting position."""
-    def __init__(self, initial_coordinates, world, image_location, health = 1, move_angle = random.randint(0, 3) * 90):
+    __slots__ = ('move_dir',)
+
+    def __init__(self, initial_coordinates, world, image_location, health = 1, move_angle = None):
         """Initialize the Grunt.
         initial_coordinates: starting position for the Grunt
         world: the map
         image_location: file path of the image for the NPC
         health = number of hits until dead
-        mov_dir = the direction the npc moves in"""
+        mov_dir = the direction the npc moves in, random if None"""
         super(Grunt, self).__init__(
         initial_coordinates, world, image_location, health)
+        if move_angle is None:
+            move_angle = world.random.randint(0, 3) * 90 # from the world, so seeded rooms stay the same
         self.move_dir = angle_to_dir(move_angle)
 
     def action(self):
@@ -225,15 +307,40 @@ class Grunt(Npc):
             self.move_dir = get_rev_dir(self.move_dir)
         # when turning around, stab?
 
-class Hill(Actor):
-    """Creates a hill to place in the world"""
-    def __init__(self, initial_coordinates, world, image_location):
-        """Initialize the Hill.
-        initial_coordinates: the starting coordinates for the Hill
+class Sentry(Grunt):
+    """Grunt that walks back and forth until it sees the player, then
+    chases them for as long as they stay in sight"""
+    __slots__ = ()
+
+    def action(self):
+        """Take a step towards the player if they can be seen, otherwise
+        keep walking back and forth"""
+        if not self.sees_player():
+            super(Sentry, self).action()
+            return
+        direction = self.world.flow_field.next_step(self.cell_coordinates)
+        if direction is not None:
+            self.move(direction)
+
+class Chaser(Npc):
+    """NPC that walks towards the player, around walls and hills, by
+    following the world's shared flow field"""
+    __slots__ = ()
+
+    def __init__(self, initial_coordinates, world, image_location, health = 1):
+        """Initialize the Chaser.
+        initial_coordinates: starting position for the Chaser
         world: the map
-        image_location: file path of the image for the hill"""
-        super(Hill, self).__init__(
-            initial_coordinates, world, image_location, removable=False)
+        image_location: file path of the image for the NPC
+        health = number of hits until dead"""
+        super(Chaser, self).__init__(
+            initial_coordinates, world, image_location, health)
+
+    def action(self):
+        """Take a step towards the player, if there is a free one"""
+        direction = self.world.flow_field.next_step(self.cell_coordinates)
+        if direction is not None:
+            self.move(direction) # turns to face the step first, like any move
 
 # class Tile(Actor):
 #     """Creates a tile on to place in the world"""
@@ -0,0 +1,109 @@
+import time
+import actors
+
+FAR_INTERVAL = 4 # ticks between the actions of an npc off the screen, while keeping up
+NEAR_MARGIN = 1 # cells past the edge of the screen that still count as near
+DEFAULT_BUDGET = 0.004 # seconds each tick may spend on npcs off the screen, when drawing
+
+class AI_Scheduler():
+    """Decides which npcs act each tick. Npcs near the player, ie on the
+    screen, act every tick. The rest take turns, a share of them each tick
+    so that each acts every FAR_INTERVAL ticks, for as long as the time
+    budget lasts. Turns the budget runs out before are owed, and taken on
+    the next tick as well as its own share.
+
+    Without a budget the same npcs act every time, so a game can be
+    replayed. With one, which far npcs act depends on the speed of the
+    machine, but only once it falls behind."""
+    def __init__(self, world, budget=None):
+        """Initialize the scheduler.
+        world: the world whose npcs act
+        budget: the seconds each tick may spend on far npcs, no limit if None"""
+        self.world = world
+        self.budget = budget
+        self.near = [] # the npcs near the player this tick, reused every tick
+        self.cursor = 0 # the index in world.npcs of the next far npc to take its turn
+        self.backlog = 0 # turns owed from earlier ticks, how far behind the scheduler is
+        self.lap_started = 0 # the tick the current pass over the npcs started on
+        self.lap_ticks = FAR_INTERVAL # ticks the last full pass over the npcs took, or this one if longer
+
+    def _acts(self, npc):
+        """Checks if an npc has an action to run, grunts in a vectorized
+        world are all moved at once instead"""
+        kind = type(npc)
+        if kind == actors.Grunt:
+            return self.world.grid_state is None
+        return kind == actors.Chaser or kind == actors.Sentry
+
+    def _find_near(self, view):
+        """Collect the npcs on the screen, or a cell past its edge. Whichever
+        is fewer is gone through, the npcs or the cells on the screen, so
+        thousands of npcs cost no more than an empty world."""
+        world = self.world
+        near = self.near
+        near.clear()
+        left = view.x - NEAR_MARGIN
+        right = view.x + view.width + NEAR_MARGIN
+        top = view.y - NEAR_MARGIN
+        bottom = view.y + view.height + NEAR_MARGIN
+        if len(world.npcs) < (right - left) * (bottom - top):
+            for npc in world.npcs:
+                x, y = npc.cell_coordinates
+                if left <= x < right and top <= y < bottom:
+                    near.append(npc)
+            return near
+        for x in range(left, right):
+            for y in range(top, bottom):
+                for actor in world.actors_at((x, y)):
+                    if isinstance(actor, actors.Npc):
+                        near.append(actor)
+        return near
+
+    def run(self):
+        """Run the actions of the npcs whose turn it is this tick"""
+        world = self.world
+        ticks = world.ticks
+        view = world.camera
+        if view is None: # the whole world is on the screen, so every npc is near
+            for npc in world.npcs:
+                if self._acts(npc):
+                    npc.action()
+            return
+        view.follow()
+        for npc in self._find_near(view):
+            npc.acted_tick = ticks # found before any moved, so each is only found once
+            if self._acts(npc):
+                npc.action()
+        self._take_turns(ticks)
+
+    def _take_turns(self, ticks):
+        """Run the actions of the far npcs next in line, until this tick's
+        share and the turns owed are done or the budget runs out"""
+        npcs = self.world.npcs
+        count = len(npcs)
+        if not count:
+            self.backlog = 0
+            return
+        turns = min(self.backlog + (count + FAR_INTERVAL - 1) // FAR_INTERVAL, count)
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        taken = 0
+        cursor = self.cursor
+        while taken < turns:
+            if cursor >= len(npcs): # dead npcs shortened the list
+                cursor = 0
+            npc = npcs[cursor]
+            cursor += 1
+            taken += 1
+            if cursor == len(npcs): # every npc has had a turn
+                cursor = 0
+                self.lap_ticks = ticks - self.lap_started + 1
+                self.lap_started = ticks + 1
+            if npc.acted_tick != ticks and self._acts(npc): # near npcs have acted already
+                npc.acted_tick = ticks
+                npc.action()
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+        self.cursor = cursor
+        self.backlog = turns - taken
+        if ticks - self.lap_started + 1 > self.lap_ticks: # the pass going on is already slower
+            self.lap_ticks = ticks - self.lap_started + 1
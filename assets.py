@@ -0,0 +1,168 @@
+"""The images used by actors and tiles, decoded once per process.
+
+Run "python assets.py" to pack every image in images/, already decoded
+and rotated to each facing, into one bundle file. The cache memory maps
+the bundle the first time an image is asked for, so starting the game
+decodes no JPEGs. Images missing from the bundle, or changed since it was
+made, are decoded from their files as before."""
+import argparse
+import glob
+import mmap
+import os
+import struct
+import pygame
+from pygame import transform
+
+FACINGS = (0, 90, 180, 270) # the angles an actor can face
+SPRITE_SIZE = 45 # pixels across the images, cells this size or bigger draw them as they are
+BUNDLE_FILE = 'images/sprites.bundle' # where the bundle is made and looked for
+BUNDLE_MAGIC = b'SPRT'
+BUNDLE_VERSION = 1
+PIXEL_FORMAT = 'RGB' # how the pixels are stored in the bundle, 3 bytes each
+# magic, version, number of images
+BUNDLE_HEADER = struct.Struct('<4sHH')
+# length of the path, size and modified time of the image file when bundled,
+# then for each facing: width, height and where its pixels start in the file
+BUNDLE_ENTRY = struct.Struct('<HIq' + 'HHI' * len(FACINGS))
+
+class Sprite_Cache():
+    """Process wide cache of the images used by actors. Each image file is
+    decoded once, converted to the display format, and rotated to each
+    facing so that actors can share the same surfaces."""
+    def __init__(self, bundle_path=BUNDLE_FILE):
+        """Initialize an empty cache
+        bundle_path: the bundle to take images from, if there is one"""
+        self.sprites = {} # image path, or (image path, size, scale) when scaled -> {facing: surface}
+        self.bundle_path = bundle_path
+        self.bundle = None # image path -> (size, modified time, [(width, height, offset)] for each facing)
+        self.bundle_map = None # the memory mapped bundle, kept open while its pixels are in use
+
+    def _open_bundle(self):
+        """Map the bundle and read where each image is in it. Only the
+        index is read, the pixels are read as each image is used."""
+        self.bundle = {}
+        if self.bundle_path is None or not os.path.exists(self.bundle_path):
+            return
+        with open(self.bundle_path, 'rb') as file:
+            self.bundle_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self.bundle_map
+        magic, version, count = BUNDLE_HEADER.unpack_from(data, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION: # from another version, decode instead
+            return
+        offset = BUNDLE_HEADER.size
+        for i in range(count):
+            entry = BUNDLE_ENTRY.unpack_from(data, offset)
+            offset += BUNDLE_ENTRY.size
+            path = data[offset:offset + entry[0]].decode('utf-8')
+            offset += entry[0]
+            rotations = [entry[3 + facing * 3:6 + facing * 3] for facing in range(len(FACINGS))]
+            self.bundle[path] = (entry[1], entry[2], rotations)
+
+    def _from_bundle(self, key):
+        """Get the images for a sprite from the bundle, None if it is not
+        there or its file has changed since"""
+        if self.bundle is None:
+            self._open_bundle()
+        entry = self.bundle.get(key)
+        if entry is None:
+            return None
+        size, modified, rotations = entry
+        try:
+            stat = os.stat(key)
+        except OSError: # only in the bundle, which is fine
+            stat = None
+        if stat is not None and (stat.st_size != size or stat.st_mtime_ns != modified):
+            return None
+        display = pygame.display.get_surface() is not None
+        images = {}
+        for facing, (width, height, offset) in zip(FACINGS, rotations):
+            pixels = self.bundle_map[offset:offset + width * height * len(PIXEL_FORMAT)]
+            image = pygame.image.frombuffer(pixels, (width, height), PIXEL_FORMAT)
+            images[facing] = image.convert() if display else image
+        return images
+
+    def get(self, image_loc, size=None, scale=1):
+        """Get the images for a sprite, keyed by facing angle
+
+        image_loc: file path of the image
+        size: pixels across to scale the images down to, as they are if None
+        scale: whole number to then scale the images up by, each pixel
+            becoming a square, so they look drawn at size in a bigger window"""
+        key = os.path.normpath(image_loc) # './images/a.jpg' and 'images/a.jpg' are the same file
+        if size is not None or scale != 1:
+            key = (key, size, scale)
+        try:
+            return self.sprites[key]
+        except KeyError:
+            pass
+        if scale != 1: # scaled up once from the small images, rather than every frame
+            rotations = {}
+            for facing, image in self.get(image_loc, size).items():
+                rotations[facing] = transform.scale(image, (image.get_width() * scale, image.get_height() * scale))
+            self.sprites[key] = rotations
+            return rotations
+        if size is not None: # scaled once from the full size images
+            rotations = {}
+            for facing, image in self.get(image_loc).items():
+                rotations[facing] = transform.smoothscale(image, (size, size))
+            self.sprites[key] = rotations
+            return rotations
+        rotations = self._from_bundle(key)
+        if rotations is None:
+            rotations = decode(image_loc)
+        self.sprites[key] = rotations
+        return rotations
+
+    def clear(self):
+        """Forget every cached image, ie when the display mode changes. Actors
+        keep the images they already have, new ones get them afresh."""
+        self.sprites = {}
+
+def decode(image_loc):
+    """Decode an image file and rotate it to each facing"""
+    image = pygame.image.load(image_loc)
+    if pygame.display.get_surface() is not None: # convert needs a display mode
+        image = image.convert()
+    rotations = {}
+    for facing in FACINGS:
+        rotations[facing] = transform.rotate(image, facing)
+    return rotations
+
+def write_bundle(path, image_paths):
+    """Pack images, decoded and rotated to each facing, into a bundle
+
+    path: the bundle file to write
+    image_paths: the image files to put in it"""
+    index = []
+    pixels = []
+    offset = BUNDLE_HEADER.size
+    for image_loc in image_paths:
+        offset += BUNDLE_ENTRY.size + len(os.path.normpath(image_loc).encode('utf-8'))
+    for image_loc in image_paths:
+        key = os.path.normpath(image_loc)
+        stat = os.stat(image_loc)
+        rotations = []
+        for facing, image in decode(image_loc).items():
+            data = pygame.image.tobytes(image, PIXEL_FORMAT)
+            rotations.extend((image.get_width(), image.get_height(), offset))
+            pixels.append(data)
+            offset += len(data)
+        encoded = key.encode('utf-8')
+        index.append(BUNDLE_ENTRY.pack(len(encoded), stat.st_size, stat.st_mtime_ns, *rotations) + encoded)
+    with open(path, 'wb') as file:
+        file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index)))
+        file.write(b''.join(index))
+        file.write(b''.join(pixels))
+
+sprites = Sprite_Cache() # the shared cache
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pack the images into one pre-decoded bundle')
+    parser.add_argument('--output', default=BUNDLE_FILE, help='the bundle file to write')
+    args = parser.parse_args(argv)
+    image_paths = sorted(glob.glob('images/*.jpg'))
+    write_bundle(args.output, image_paths)
+    print('%d images bundled into %s' % (len(image_paths), args.output))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Plays seeded games with a scripted bot across a pool of processes.
+
+Run "python batch.py --seeds 1000 --summary summary.json" to play a
+thousand games, one per seed, and write the rooms cleared, deaths and
+ticks per room of each level to summary.json, for balancing how hard each
+level is. Add "--results results.jsonl" to also keep every game's rooms,
+written as each game finishes."""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+import actors
+import controller
+import game
+
+MAX_ROOMS = 10 # rooms a game may go through before it is stopped
+MAX_ROOM_TICKS = 1000 # ticks a room may take before the bot counts as stuck
+STEPS = {'up': (0, -1), 'left': (-1, 0), 'down': (0, 1), 'right': (1, 0)}
+FACINGS = {'up': 0, 'left': 90, 'down': 180, 'right': 270}
+DIRECTIONS = {angle: direction for direction, angle in FACINGS.items()} # facing -> direction
+FACING_BACK = {(0, -1): 'down', (-1, 0): 'right', (0, 1): 'up', (1, 0): 'left'} # step -> the direction looking back
+
+class Bot_Controller(controller.Player_Controller):
+    """Controller that plays by itself: it walks to where the nearest npc
+    will be next, turns to face it and swings the sword, then leaves
+    through the door once the room is clear. It keeps out of the cells the
+    npcs are about to step into, as the npcs move before the player."""
+    def __init__(self):
+        """Initialize the bot. Its game is set once the game is made."""
+        super(Bot_Controller, self).__init__() # uses the __init__ method from Player_Controller()
+        self.game = None
+        self.queue = deque() # reused for each search
+        self.came_from = {} # cell -> the cell it was found from, in the last search
+
+    def _first_step(self, start, goals):
+        """Find the direction of the first step on the shortest way from a
+        cell to any of the goals, breadth first. None if there is no way.
+
+        goals: the cells to find a way to, which may be occupied"""
+        world = self.game.world
+        came_from = self.came_from
+        came_from.clear()
+        came_from[start] = None
+        queue = self.queue
+        queue.clear()
+        queue.append(start)
+        while queue:
+            cell = queue.popleft()
+            if cell in goals:
+                while came_from[cell] != start:
+                    if came_from[cell] is None: # already at a goal
+                        return None
+                    cell = came_from[cell]
+                for direction, step in STEPS.items():
+                    if (start[0] + step[0], start[1] + step[1]) == cell:
+                        return direction
+            for step in STEPS.values():
+                next_cell = (cell[0] + step[0], cell[1] + step[1])
+                if next_cell in came_from or not world._is_in_grid(next_cell):
+                    continue
+                if next_cell in goals or not world._is_occupied(next_cell):
+                    came_from[next_cell] = cell
+                    queue.append(next_cell)
+        return None
+
+    def _path(self, npc):
+        """Guess the next two cells an npc steps into, the same cell if it
+        stays where it is. None for the second if it could go anywhere from
+        the first, as chasers do."""
+        world = self.game.world
+        cell = npc.cell_coordinates
+        direction = getattr(npc, 'move_dir', None) # grunts and sentries walk back and forth
+        chasing = isinstance(npc, actors.Chaser) or (isinstance(npc, actors.Sentry) and npc.sees_player())
+        if chasing:
+            direction = world.flow_field.next_step(cell)
+        if direction is None:
+            return cell, None if chasing else cell
+        step = STEPS[direction]
+        first = (cell[0] + step[0], cell[1] + step[1])
+        if world._is_occupied(first):
+            return cell, None if chasing else cell
+        if chasing:
+            return first, None
+        return first, (first[0] + step[0], first[1] + step[1])
+
+    def _result(self, direction):
+        """Get the cell the player ends up in after pressing a direction,
+        and the direction they then face. They only move if already facing
+        that way and the cell is free, otherwise they turn."""
+        player = self.game.world.player
+        here = player.cell_coordinates
+        if direction is None:
+            return here, DIRECTIONS[player.facing]
+        if player.facing != FACINGS[direction]:
+            return here, direction
+        step = STEPS[direction]
+        next_cell = (here[0] + step[0], here[1] + step[1])
+        return (next_cell if player.is_valid(next_cell) else here), direction
+
+    def _risk(self, direction, paths, spared=None):
+        """Count the npcs that could step into the player after pressing a
+        direction, as (on the next tick, on the one after). One coming at
+        them from the front is not counted, as the sword gets it first.
+
+        paths: the next two cells of each npc
+        spared: an npc the sword kills this tick, so it can be ignored"""
+        cell, facing = self._result(direction)
+        step = STEPS[facing]
+        front = (cell[0] + step[0], cell[1] + step[1])
+        now = later = 0
+        for npc, (first, second) in paths.items():
+            if npc is spared:
+                continue
+            if first == cell:
+                now += 1
+            elif first == front: # steps in front, to be hit next tick
+                continue
+            elif second == cell:
+                later += 1
+            elif second is None and abs(first[0] - cell[0]) + abs(first[1] - cell[1]) == 1:
+                later += 1 # a chaser could step in from the side
+        return now, later
+
+    def _choose(self):
+        """Choose a direction to move in or the sword for this tick. Returns
+        (direction, action), either may be None."""
+        world = self.game.world
+        player = world.player
+        here = player.cell_coordinates
+        if world.cleared:
+            return self._first_step(here, (world.door_position,)), None
+        paths = {npc: self._path(npc) for npc in world.npcs}
+        goals = {} # cell to stand in -> the direction to face there
+        beside = None # the direction of an npc next to the player
+        coming = None # the direction of a chaser about to step next to the player
+        target = None # the npc in front of the player, which the sword kills
+        for npc, (first, second) in paths.items():
+            cell = npc.cell_coordinates
+            for direction, step in STEPS.items():
+                if (cell[0] - step[0], cell[1] - step[1]) == here: # next to it
+                    if player.facing == FACINGS[direction]:
+                        target = npc
+                    beside = direction
+                if second is None and (first[0] - step[0], first[1] - step[1]) == here:
+                    coming = direction # face it now, or it can not be faced before it steps in
+            if second is not None and second != first: # walking back and forth, so wait in its way
+                step = (second[0] - first[0], second[1] - first[1])
+                back = (-step[0], -step[1])
+                # ahead of it, or behind it for when it turns around
+                for start, step in ((second, step), ((cell[0] + back[0], cell[1] + back[1]), back)):
+                    towards = FACING_BACK[step]
+                    goal = start
+                    while world._is_in_grid(goal) and not world._is_occupied(goal):
+                        goals.setdefault(goal, towards)
+                        goal = (goal[0] + step[0], goal[1] + step[1])
+                continue
+            for direction, step in STEPS.items(): # standing or chasing, so go up to it
+                goal = (first[0] - step[0], first[1] - step[1])
+                if not world._is_occupied(goal):
+                    goals.setdefault(goal, direction)
+        if beside is not None: # turn to face it
+            choice = beside
+        elif coming is not None:
+            choice = None if player.facing == FACINGS[coming] else coming
+        elif here in goals: # wait for an npc to step in front
+            choice = goals[here]
+            if player.facing == FACINGS[choice]: # already facing it, so pressing would walk on
+                choice = None
+        else:
+            choice = self._first_step(here, goals)
+        # the least risky of swinging, the choice, waiting and stepping aside,
+        # in that order when they are as risky
+        options = [(direction, None) for direction in [choice, None] + list(STEPS)]
+        risks = [self._risk(direction, paths) for direction, action in options]
+        if target is not None:
+            options.insert(0, (None, 'sword'))
+            risks.insert(0, self._risk(None, paths, target))
+        return options[risks.index(min(risks))]
+
+    def take_pressed(self):
+        """Press what the bot chose for this tick"""
+        pressed = self.pressed_last_tick
+        pressed.clear()
+        direction, action = self._choose()
+        if direction is not None:
+            pressed.append(direction)
+        if action is not None:
+            pressed.append(action)
+        return pressed
+
+def play(task):
+    """Play one game with the bot, headless. Returns what happened in each
+    room it went through.
+
+    task: (seed, level, size, max_rooms), sent to a worker process"""
+    seed, level, size, max_rooms = task
+    bot = Bot_Controller()
+    played = game.Game(level=level, headless=True, seed=seed, player_controller=bot, size=size)
+    bot.game = played
+    rooms = []
+    room_ticks = 0
+    started = time.perf_counter()
+    while len(rooms) < max_rooms:
+        room_level = played.level
+        played.tick()
+        room_ticks += 1
+        if played.level != room_level: # through the door
+            rooms.append({'level': room_level, 'ticks': room_ticks, 'outcome': 'cleared'})
+            room_ticks = 0
+        elif not played.world.running:
+            rooms.append({'level': room_level, 'ticks': room_ticks, 'outcome': 'died'})
+            break
+        elif room_ticks >= MAX_ROOM_TICKS:
+            rooms.append({'level': room_level, 'ticks': room_ticks, 'outcome': 'stuck'})
+            break
+    return {'seed': seed, 'rooms': rooms, 'seconds': time.perf_counter() - started}
+
+class Summary():
+    """Totals of the games played so far, for each level"""
+    def __init__(self):
+        """Initialize empty totals"""
+        self.games = 0
+        self.ticks = 0
+        self.levels = {} # level -> totals for the rooms of that level
+
+    def add(self, result):
+        """Add the rooms of a finished game"""
+        self.games += 1
+        for room in result['rooms']:
+            totals = self.levels.get(room['level'])
+            if totals is None:
+                totals = self.levels[room['level']] = {'rooms': 0, 'cleared': 0, 'died': 0, 'stuck': 0,
+                                                       'cleared_ticks': 0}
+            totals['rooms'] += 1
+            totals[room['outcome']] += 1
+            if room['outcome'] == 'cleared':
+                totals['cleared_ticks'] += room['ticks']
+            self.ticks += room['ticks']
+
+    def to_json(self, seconds):
+        """Get the totals as something json can write
+
+        seconds: how long the games took to play"""
+        levels = {}
+        for level, totals in sorted(self.levels.items()):
+            levels[str(level)] = dict(totals, death_rate=totals['died'] / totals['rooms'],
+                                      mean_ticks_to_clear=totals['cleared_ticks'] / totals['cleared']
+                                      if totals['cleared'] else None)
+        return {'games': self.games, 'ticks': self.ticks, 'seconds': seconds,
+                'ticks_per_second': self.ticks / seconds if seconds else 0.0, 'levels': levels}
+
+def run_batch(tasks, processes, results_file=None, progress=True):
+    """Play every task across a pool of processes, adding each game to the
+    summary as soon as it finishes. Returns the summary and the seconds
+    it took.
+
+    processes: the number of worker processes, 1 plays in this process
+    results_file: an open file to write each game to as a line of json"""
+    summary = Summary()
+    every = max(1, len(tasks) // 100) # games between progress lines
+    started = time.perf_counter()
+    pool = None
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        chunksize = max(1, len(tasks) // (processes * 16)) # enough chunks to keep every process busy
+        results = pool.imap_unordered(play, tasks, chunksize)
+    else:
+        results = map(play, tasks)
+    try:
+        for result in results:
+            summary.add(result)
+            if results_file is not None:
+                results_file.write(json.dumps(result) + '\n')
+            if progress and (summary.games % every == 0 or summary.games == len(tasks)):
+                print('\r%d/%d games, %d ticks' % (summary.games, len(tasks), summary.ticks),
+                      end='', file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if progress:
+        print(file=sys.stderr)
+    return summary, time.perf_counter() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seeds', type=int, default=100, help='number of games to play, one per seed')
+    parser.add_argument('--first-seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--level', type=int, default=1, help='level each game starts on')
+    parser.add_argument('--rooms', type=int, default=MAX_ROOMS, help='rooms each game may go through')
+    parser.add_argument('--size', type=int, default=15, help='width and height of the rooms in cells')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--summary', default='batch_summary.json', help='file to write the totals to')
+    parser.add_argument('--results', help='file to write every game to, one line of json each')
+    args = parser.parse_args(argv)
+
+    summary_file = os.path.abspath(args.summary)
+    results_path = args.results and os.path.abspath(args.results)
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # image paths are relative to the game
+    tasks = [(seed, args.level, args.size, args.rooms)
+             for seed in range(args.first_seed, args.first_seed + args.seeds)]
+    results_file = open(results_path, 'w') if results_path else None
+    try:
+        summary, seconds = run_batch(tasks, args.processes, results_file)
+    finally:
+        if results_file is not None:
+            results_file.close()
+    with open(summary_file, 'w') as file:
+        json.dump(summary.to_json(seconds), file, indent=2)
+    print('%d games, %d ticks in %.1f s, %.0f ticks/s, summary written to %s' % (
+        summary.games, summary.ticks, seconds, summary.ticks / seconds if seconds else 0.0, summary_file))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
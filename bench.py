@@ -0,0 +1,563 @@
+"""Benchmarks for world generation, tick throughput and render cost.
+
+Run "python bench.py --output results.json" to measure, and
+"python bench.py --baseline results.json" to compare a later run against
+it. Rendering is done offscreen unless --onscreen is given."""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import pygame
+import actors
+import ai
+import assets
+import gameworld
+import grid_state
+import pathfinding
+import render
+import replay
+import snapshot
+import spawner
+import tiles
+
+SIZES = [15, 50, 100, 200, 400] # cells per side of the world
+QUICK_SIZES = [15, 50]
+ACTOR_COUNTS = [0, 10, 100, 1000] # grunts added to the world
+QUICK_ACTOR_COUNTS = [0, 10]
+MAX_WINDOW = 1024 # largest window in pixels for rendered benchmarks
+VIEW_SIZE = 15 # cells across the screen for scrolling benchmarks
+AI_WORLD_SIZE = 200 # cells per side of the world for the AI scheduler benchmark
+AI_COUNTS = [100, 1000, 10000] # grunts in the AI scheduler benchmark
+QUICK_AI_COUNTS = [100, 1000]
+IMAGE_FILES = ['images/player.jpg', 'images/npc1.jpg', 'images/npc2.jpg', 'images/sword.jpg'] # besides the tiles'
+WAVE_WORLD_SIZE = 60 # cells per side of the rooms for the wave benchmark
+WAVE_LEVELS = [5, 20, 30] # levels of the rooms for the wave benchmark, 11 to 436 npcs
+# (name, cell size, scale) of the windows for the scaling benchmark: the usual
+# 675 pixel window, and a 2025 pixel one drawn at full size and scaled up
+SCALED_WINDOWS = [('native/675', 45, 1), ('native/2025', 135, 1), ('scaled/2025', 15, 9)]
+# times the usual window's frame the scaled one's may cost, with dirty rects.
+# Its images cover nine times the pixels, so it costs about three of the
+# usual frames; scaling up the dirty rects each frame cost seven.
+SCALED_LIMIT = 4.0
+SCALED_ACTORS = 10 # grunts walking about in the room, so the dirty rects have something to do
+SCALED_FRAMES = 20 # frames drawn for each scaling measurement
+ALLOCATION_WARMUP = 1000 # frames before the allocations are expected to stay flat
+ALLOCATION_FRAMES = 1000 # frames the allocations are checked over
+# blocks a frame may leave behind on average: the occupancy index only has
+# entries for the cells the grunts are in, so it comes and goes by a few,
+# and pygame's display update keeps the odd block. Anything the game keeps
+# every frame is at least one block a frame.
+ALLOCATION_LIMIT = 0.1
+# cells per side of the worlds the chasers are timed in: one just big enough
+# to hold the flow field's search around the player, and a huge one
+CHASE_WORLD_SIZES = [2 * pathfinding.SEARCH_RADIUS + 1, 1000]
+CHASE_CHASERS = 10 # chasers near the player in each of those worlds
+CHASE_WORLD_LIMIT = 2.0 # times slower a tick may be in the huge world than the small one
+CHECK_LEVELS = [6, 10] # levels of the rooms checked to move the same vectorized, with chasers and sentries
+CHECK_SEEDS = 10 # rooms checked at each level
+CHECK_SIZE = 20 # cells per side of the rooms checked
+CHECK_TICKS = 40 # ticks each checked room is played for
+CHECK_ADDED = 10 # grunts added to each checked room after its sentries and chasers
+
+class Benchmark():
+    """Runs the benchmarks and collects the results"""
+    def __init__(self, sizes, actor_counts, ticks, repeat, seed, ai_counts=QUICK_AI_COUNTS):
+        """Initialize the benchmark.
+        sizes: cells per side of the worlds to measure
+        actor_counts: numbers of grunts to add to each world
+        ai_counts: numbers of grunts for the AI scheduler benchmark
+        ticks: ticks to run for each tick measurement
+        repeat: times to repeat each measurement, the median is kept
+        seed: seed for the random module"""
+        self.sizes = sizes
+        self.actor_counts = actor_counts
+        self.ai_counts = ai_counts
+        self.ticks = ticks
+        self.repeat = repeat
+        self.seed = seed
+        self.results = {}
+        self.mismatches = [] # replays that did not end where they were recorded
+        self.divergences = [] # rooms that did not move the same vectorized as one npc at a time
+        self.allocated = None # blocks a frame left allocated, if more than the limit
+        self.chase_slowdown = None # times slower chasing was in the huge world, if more than the limit
+        self.scaled_slowdown = None # times slower a scaled frame was than the usual window's, if more than the limit
+        self.renderers = {} # window size -> renderer, so each window is only opened once
+
+    def _record(self, name, value, unit, better):
+        """Record a result
+
+        better: 'lower' or 'higher', which way is an improvement"""
+        self.results[name] = {'value': value, 'unit': unit, 'better': better}
+        print('%-40s %12.3f %s' % (name, value, unit))
+
+    def _cell_size(self, size):
+        """Get a cell size that keeps a world's window on the screen"""
+        return max(1, min(45, MAX_WINDOW // size))
+
+    def _make_world(self, size, headless, dirty_rects=True, vectorized=False):
+        """Create a world, seeding random first so it is the same every run"""
+        random.seed(self.seed)
+        if headless:
+            return gameworld.Init_World(0, None, 1, size, size, headless=True, vectorized=vectorized,
+                                        seed=self.seed)
+        cell_size = self._cell_size(size)
+        key = (size * cell_size, dirty_rects)
+        if key not in self.renderers:
+            self.renderers[key] = render.Dirty_Rect_Renderer() if dirty_rects else render.Screen_Renderer()
+        return gameworld.Init_World(0, None, 1, size, size, cell_size, renderer=self.renderers[key],
+                                    seed=self.seed)
+
+    def _add_grunts(self, world, count):
+        """Add grunts to free cells of a world"""
+        free = [cell for cell in world.cells
+                if not world._is_occupied(cell) and cell != world.player.cell_coordinates]
+        free.sort()
+        for cell in random.sample(free, min(count, len(free))):
+            grunt = actors.Grunt(cell, world, 'images/npc1.jpg', move_angle=random.randint(0, 3) * 90)
+            world.add_actor(grunt)
+
+    def _add_chasers(self, world, count, cls=actors.Chaser):
+        """Add chasers to free cells of a world
+
+        cls: the class of npc to add, ie sentries, which only chase once
+            they see the player"""
+        free = [cell for cell in world.cells
+                if not world._is_occupied(cell) and cell != world.player.cell_coordinates]
+        free.sort()
+        for cell in random.sample(free, min(count, len(free))):
+            world.add_actor(cls(cell, world, 'images/npc1.jpg'))
+
+    def _median_time(self, function):
+        """Time a function, returning the median of the repeats in seconds"""
+        times = []
+        for i in range(self.repeat):
+            gc.collect()
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    def _run_ticks(self, world, update, ticks, alpha):
+        """Run ticks of a world, drawing after each one if alpha is given"""
+        for i in range(ticks):
+            world.ticks += 1
+            update._update()
+            if alpha is not None:
+                world.renderer.render(world, alpha)
+
+    def bench_construction(self):
+        """Time building worlds of each size"""
+        for size in self.sizes:
+            seconds = self._median_time(lambda: self._make_world(size, True))
+            self._record('construct/%dx%d' % (size, size), seconds * 1000, 'ms', 'lower')
+
+    def bench_memory(self):
+        """Measure the memory a room of each size takes up once built"""
+        for size in self.sizes:
+            gc.collect()
+            tracemalloc.start()
+            world = self._make_world(size, True)
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del world
+            self._record('memory/%dx%d' % (size, size), used / 1024, 'KiB', 'lower')
+
+    def bench_snapshots(self):
+        """Time restoring worlds of each size from snapshots, to compare
+        with building them"""
+        for size in self.sizes:
+            data = snapshot.dumps(self._make_world(size, True))
+            seconds = self._median_time(lambda: snapshot.loads(data, headless=True))
+            self._record('restore/%dx%d' % (size, size), seconds * 1000, 'ms', 'lower')
+            self._record('snapshot_size/%dx%d' % (size, size), len(data) / 1024, 'KiB', 'lower')
+
+    def bench_startup(self):
+        """Time starting the game until its first frame is drawn, in a new
+        process each time, and loading every image into an empty cache,
+        from the bundle if there is one"""
+        directory = os.path.dirname(os.path.abspath(__file__))
+        command = [sys.executable, os.path.join(directory, 'game.py'), '--first-frame']
+        seconds = self._median_time(lambda: subprocess.run(command, cwd=directory, check=True,
+                                                           stdout=subprocess.DEVNULL))
+        self._record('startup/first_frame', seconds * 1000, 'ms', 'lower')
+        image_paths = sorted(set(tiles.IMAGES.values()) | set(IMAGE_FILES))
+        def load():
+            cache = assets.Sprite_Cache()
+            for image_loc in image_paths:
+                cache.get(image_loc)
+        seconds = self._median_time(load)
+        self._record('startup/sprites', seconds * 1000, 'ms', 'lower')
+
+    def bench_waves(self):
+        """Time building rooms whose waves are drawn from a pool the last
+        room gave its npcs back to, as when going from room to room, and
+        count the npcs that still had to be made"""
+        size = WAVE_WORLD_SIZE
+        for level in WAVE_LEVELS:
+            def build():
+                world = gameworld.Init_World(0, None, level, size, size, headless=True, seed=self.seed)
+                spawner.pool.release_all(world.npcs) # left for the next room
+            build() # fill the pool
+            created = spawner.pool.created
+            seconds = self._median_time(build)
+            self._record('wave/%d' % level, seconds * 1000, 'ms', 'lower')
+            self._record('wave_created/%d' % level, spawner.pool.created - created, 'npcs', 'lower')
+
+    def bench_ticks(self, headless, dirty_rects=True, vectorized=False):
+        """Measure ticks per second for each world size and number of grunts"""
+        if vectorized:
+            mode = 'vectorized'
+        elif headless:
+            mode = 'headless'
+        else:
+            mode = 'dirty' if dirty_rects else 'full'
+        for size in self.sizes:
+            for count in self.actor_counts:
+                world = self._make_world(size, headless, dirty_rects, vectorized)
+                self._add_grunts(world, count)
+                update = gameworld.Update(world)
+                alpha = None if headless else 1.0
+                self._run_ticks(world, update, 5, alpha) # warm up
+                seconds = self._median_time(lambda: self._run_ticks(world, update, self.ticks, alpha))
+                self._record('ticks/%s/%dx%d/%d' % (mode, size, size, count),
+                             self.ticks / seconds, 'ticks/s', 'higher')
+
+    def bench_camera(self):
+        """Measure ticks per second rendering worlds of each size through a
+        camera, which should barely depend on the size of the world"""
+        renderer = render.Camera_Renderer()
+        for size in self.sizes:
+            if size <= VIEW_SIZE: # fits on the screen, so there is nothing to scroll
+                continue
+            for count in self.actor_counts:
+                random.seed(self.seed)
+                world = gameworld.Init_World(0, None, 1, size, size, renderer=renderer, seed=self.seed,
+                                             view_size=(VIEW_SIZE, VIEW_SIZE))
+                self._add_grunts(world, count)
+                update = gameworld.Update(world)
+                self._run_ticks(world, update, 5, 0.5) # warm up
+                seconds = self._median_time(lambda: self._run_ticks(world, update, self.ticks, 0.5))
+                self._record('ticks/camera/%dx%d/%d' % (size, size, count),
+                             self.ticks / seconds, 'ticks/s', 'higher')
+
+    def bench_scaled(self, dirty_rects=False):
+        """Time drawing a tick's frame of a room into windows of each size,
+        drawn at full size or at low resolution and scaled up"""
+        mode = 'dirty' if dirty_rects else 'full'
+        for name, cell_size, scale in SCALED_WINDOWS:
+            random.seed(self.seed)
+            if dirty_rects:
+                renderer = render.Dirty_Rect_Renderer(scale)
+            else:
+                renderer = render.Screen_Renderer(scale)
+            world = gameworld.Init_World(0, None, 1, VIEW_SIZE, VIEW_SIZE, cell_size, renderer=renderer,
+                                         seed=self.seed)
+            self._add_grunts(world, SCALED_ACTORS)
+            update = gameworld.Update(world)
+            self._run_ticks(world, update, 5, 1.0) # warm up
+            seconds = self._median_time(lambda: self._run_ticks(world, update, SCALED_FRAMES, 1.0))
+            self._record('frame/%s/%s' % (mode, name), seconds * 1000 / SCALED_FRAMES, 'ms', 'lower')
+        if dirty_rects: # the full renderer redraws every pixel, so costs more the bigger the window
+            slowdown = self.results['frame/dirty/scaled/2025']['value'] / self.results['frame/dirty/native/675']['value']
+            if slowdown > SCALED_LIMIT:
+                self.scaled_slowdown = slowdown
+
+    def bench_ai(self):
+        """Measure the time of a tick with the AI scheduler's time budget,
+        which should stay about the same however many grunts there are,
+        and how many turns it falls behind by"""
+        size = AI_WORLD_SIZE
+        for count in self.ai_counts:
+            random.seed(self.seed)
+            world = gameworld.Init_World(0, None, 1, size, size, headless=True, seed=self.seed,
+                                         view_size=(VIEW_SIZE, VIEW_SIZE), ai_budget=ai.DEFAULT_BUDGET)
+            self._add_grunts(world, count)
+            update = gameworld.Update(world)
+            self._run_ticks(world, update, 5, None) # warm up
+            seconds = self._median_time(lambda: self._run_ticks(world, update, self.ticks, None))
+            self._record('ai/%dx%d/%d' % (size, size, count), seconds / self.ticks * 1000, 'ms/tick', 'lower')
+            self._record('ai_backlog/%dx%d/%d' % (size, size, count), world.ai.backlog, 'turns', 'lower')
+
+    def bench_chase(self, cls=actors.Chaser, name='chase'):
+        """Measure ticks per second with chasers, the player moving every
+        tick so the flow field, and what the player can be seen from, are
+        worked out again each time
+
+        cls: the class of npc that chases, ie sentries
+        name: the name of the benchmark"""
+        for size in self.sizes:
+            for count in self.actor_counts:
+                world = self._make_world(size, True)
+                self._add_chasers(world, count, cls)
+                update = gameworld.Update(world)
+                player = world.player
+                x, y = player.cell_coordinates
+                cells = [(x, y), (x + 1, y)]
+                def chase():
+                    for i in range(self.ticks):
+                        player.cell_coordinates = cells[i % 2] # the chasers step into the player, so it stays put
+                        world.ticks += 1
+                        update._update()
+                chase() # warm up
+                seconds = self._median_time(chase)
+                self._record('ticks/%s/%dx%d/%d' % (name, size, size, count),
+                             self.ticks / seconds, 'ticks/s', 'higher')
+
+    def bench_chase_worlds(self):
+        """Measure ticks with chasers near the player as they walk about, in
+        a world just big enough for the flow field's search and in a huge
+        one, and fail if the huge one is more than CHASE_WORLD_LIMIT times
+        slower, as the search should only go as far as SEARCH_RADIUS"""
+        seconds = []
+        for size in CHASE_WORLD_SIZES:
+            world = gameworld.Init_World(0, None, 1, size, size, headless=True, seed=self.seed)
+            player = world.player
+            x, y = player.cell_coordinates
+            rng = random.Random(self.seed)
+            radius = pathfinding.SEARCH_RADIUS - 2
+            added = 0
+            while added < CHASE_CHASERS: # only near the player, listing every free cell of a huge world is slow
+                cell = (x + rng.randint(-radius, radius), y + rng.randint(-radius, radius))
+                if world._is_in_grid(cell) and not world._is_occupied(cell) and abs(cell[0] - x) + abs(cell[1] - y) > 2:
+                    world.add_actor(actors.Chaser(cell, world, 'images/npc1.jpg'))
+                    added += 1
+            update = gameworld.Update(world)
+            cells = [(x, y), (x + 1, y)]
+            def chase():
+                for i in range(self.ticks):
+                    player.cell_coordinates = cells[i % 2] # the chasers step into the player, so it stays put
+                    world.ticks += 1
+                    update._update()
+            chase() # warm up
+            seconds.append(self._median_time(chase))
+            self._record('ticks/chase_world/%dx%d/%d' % (size, size, CHASE_CHASERS),
+                         self.ticks / seconds[-1], 'ticks/s', 'higher')
+        if seconds[-1] > seconds[0] * CHASE_WORLD_LIMIT:
+            self.chase_slowdown = seconds[-1] / seconds[0]
+
+    def bench_swing(self, headless):
+        """Time a sword swing in worlds of each size"""
+        mode = 'headless' if headless else 'rendered'
+        for size in self.sizes:
+            world = self._make_world(size, headless)
+            self._add_grunts(world, size) # something to hit
+            swings = 50
+            def swing():
+                for i in range(swings):
+                    world.ticks += 1
+                    world.effects.expire() # the swing from the last tick is over
+                    world.player.action('sword')
+            seconds = self._median_time(swing)
+            self._record('swing/%s/%dx%d' % (mode, size, size), seconds / swings * 1e6, 'us', 'lower')
+
+    def bench_allocations(self, warmup=ALLOCATION_WARMUP, frames=ALLOCATION_FRAMES):
+        """Count memory blocks still allocated after steady-state frames,
+        and fail if each frame left more than ALLOCATION_LIMIT behind.
+        Returns the blocks each frame left.
+
+        warmup: frames before the allocations are expected to stay flat
+        frames: frames the allocations are checked over"""
+        world = self._make_world(15, False)
+        self._add_grunts(world, 10)
+        update = gameworld.Update(world)
+        tracemalloc.start()
+        # warm up the pools and indexes while tracing, as the blocks they
+        # replace are only counted as freed if they were traced
+        self._run_ticks(world, update, warmup, 0.5)
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        self._run_ticks(world, update, frames, 0.5)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'lineno')
+                     if stat.traceback[0].filename != tracemalloc.__file__)
+        self._record('allocations/15x15/10', blocks / frames, 'blocks/frame', 'lower')
+        if blocks / frames > ALLOCATION_LIMIT:
+            self.allocated = blocks / frames
+        return blocks / frames
+
+    def _play_moves(self, world, seed):
+        """Play a world's npcs, with nothing from the player, and get where
+        every actor is and where it is going after each tick
+
+        seed: seed for the random module, which restored worlds use"""
+        random.seed(seed)
+        update = gameworld.Update(world)
+        moves = []
+        for tick in range(CHECK_TICKS):
+            world.ticks += 1
+            update._npc_actions()
+            moves.append([(type(actor).__name__, actor.cell_coordinates, actor.facing,
+                           getattr(actor, 'move_dir', None)) for actor in world.actors])
+        return moves
+
+    def _add_late_grunts(self, world, seed):
+        """Add grunts to a generated room, after its sentries and chasers,
+        in the same cells whether or not the room is vectorized"""
+        rng = random.Random(seed)
+        free = sorted(cell for cell in world.cells
+                      if not world._is_occupied(cell) and cell != world.player.cell_coordinates)
+        for cell in rng.sample(free, min(CHECK_ADDED, len(free))):
+            world.add_actor(actors.Grunt(cell, world, 'images/npc1.jpg', move_angle=rng.randint(0, 3) * 90))
+
+    def check_vectorized(self):
+        """Check vectorized rooms move exactly as they do one npc at a time,
+        built, restored from a snapshot, or with grunts added after the
+        chasers and sentries, which move among the grunts"""
+        for level in CHECK_LEVELS:
+            for seed in range(CHECK_SEEDS):
+                built = [gameworld.Init_World(0, None, level, CHECK_SIZE, CHECK_SIZE, headless=True, seed=seed,
+                                              vectorized=vectorized) for vectorized in (False, True)]
+                data = snapshot.dumps(built[0])
+                restored = [snapshot.loads(data, headless=True, vectorized=vectorized)
+                            for vectorized in (False, True)]
+                added = [gameworld.Init_World(0, None, level, CHECK_SIZE, CHECK_SIZE, headless=True, seed=seed,
+                                              vectorized=vectorized) for vectorized in (False, True)]
+                for world in added:
+                    self._add_late_grunts(world, seed)
+                for name, worlds in (('built', built), ('restored', restored), ('added', added)):
+                    if self._play_moves(worlds[0], seed) != self._play_moves(worlds[1], seed):
+                        self.divergences.append('%s/level%d/seed%d' % (name, level, seed))
+
+    def bench_replays(self, paths):
+        """Measure ticks per second replaying recorded sessions, checking
+        each ends up where it was recorded
+
+        paths: the recording files"""
+        for path in paths:
+            recording = replay.load(path)
+            games = []
+            seconds = self._median_time(lambda: games.append(replay.replay(recording)[0]))
+            if replay.state_hash(games[-1]) != recording.final_hash:
+                self.mismatches.append(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+            self._record('replay/%s' % name, len(recording.ticks) / seconds, 'ticks/s', 'higher')
+
+    def run(self):
+        """Run every benchmark"""
+        self.bench_startup()
+        self.bench_construction()
+        self.bench_memory()
+        self.bench_snapshots()
+        self.bench_waves()
+        self.bench_ticks(headless=True)
+        if grid_state.numpy is not None:
+            self.bench_ticks(headless=True, vectorized=True)
+            self.check_vectorized()
+        self.bench_ticks(headless=False, dirty_rects=True)
+        self.bench_ticks(headless=False, dirty_rects=False)
+        self.bench_camera()
+        self.bench_scaled()
+        self.bench_scaled(dirty_rects=True)
+        self.bench_chase()
+        self.bench_chase(actors.Sentry, 'sentry')
+        self.bench_chase_worlds()
+        self.bench_ai()
+        self.bench_swing(headless=True)
+        self.bench_swing(headless=False)
+        self.bench_allocations()
+
+    def metadata(self):
+        """Describe the machine and settings the benchmark ran with"""
+        return {
+            'seed': self.seed,
+            'ticks': self.ticks,
+            'repeat': self.repeat,
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+        }
+
+def compare(results, baseline, tolerance):
+    """Compare results against a baseline. Returns the names of the
+    results that got worse by more than the tolerance.
+
+    tolerance: the fraction a result may get worse by, ie 0.2 for 20%"""
+    regressions = []
+    print('\n%-40s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'change'))
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]['value']
+        new = result['value']
+        if old == 0:
+            change = 0.0 if new == 0 else float('inf')
+        else:
+            change = new / old - 1
+        if result['better'] == 'higher':
+            worse = change < -tolerance
+        else:
+            worse = change > tolerance and new - old > 0.01 # ignore noise around zero
+        if worse:
+            regressions.append(name)
+        print('%-40s %12.3f %12.3f %+7.1f%%%s' % (name, old, new, change * 100, '  REGRESSION' if worse else ''))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='file to write the results to, as JSON')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='fraction a result may get worse by before it counts as a regression')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=200, help='ticks per tick measurement')
+    parser.add_argument('--repeat', type=int, default=3, help='repeats of each measurement')
+    parser.add_argument('--quick', action='store_true', help='only measure the smaller worlds')
+    parser.add_argument('--onscreen', action='store_true', help='render to a real window')
+    parser.add_argument('--replay', action='append', default=[],
+                        help='recording made with game.py --record to replay as a workload, can be repeated')
+    args = parser.parse_args(argv)
+
+    if not args.onscreen:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # render offscreen, read when the window opens
+    output = args.output and os.path.abspath(args.output)
+    baseline_file = args.baseline and os.path.abspath(args.baseline)
+    replays = [os.path.abspath(path) for path in args.replay]
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # image paths are relative to the game
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    actor_counts = QUICK_ACTOR_COUNTS if args.quick else ACTOR_COUNTS
+    ai_counts = QUICK_AI_COUNTS if args.quick else AI_COUNTS
+    benchmark = Benchmark(sizes, actor_counts, args.ticks, args.repeat, args.seed, ai_counts)
+    benchmark.run()
+    benchmark.bench_replays(replays)
+    if output:
+        with open(output, 'w') as file:
+            json.dump({'meta': benchmark.metadata(), 'results': benchmark.results}, file, indent=2, sort_keys=True)
+    if benchmark.mismatches:
+        print('\nreplays that did not match their recording: %s' % ', '.join(benchmark.mismatches))
+        return 1
+    if benchmark.allocated is not None:
+        print('\nsteady-state frames left %.3f blocks allocated each, more than %.3f'
+              % (benchmark.allocated, ALLOCATION_LIMIT))
+        return 1
+    if benchmark.scaled_slowdown is not None:
+        print('\nscaled frames cost %.1f times the usual window\'s, more than %.1f'
+              % (benchmark.scaled_slowdown, SCALED_LIMIT))
+        return 1
+    if benchmark.chase_slowdown is not None:
+        print('\nticks with chasers were %.1f times slower in a %dx%d world than a %dx%d one, more than %.1f'
+              % (benchmark.chase_slowdown, CHASE_WORLD_SIZES[-1], CHASE_WORLD_SIZES[-1],
+                 CHASE_WORLD_SIZES[0], CHASE_WORLD_SIZES[0], CHASE_WORLD_LIMIT))
+        return 1
+    if benchmark.divergences:
+        print('\nrooms that moved differently vectorized: %s' % ', '.join(benchmark.divergences))
+        return 1
+    if baseline_file:
+        with open(baseline_file) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(benchmark.results, baseline, args.tolerance)
+        if regressions:
+            print('\n%d regression(s)' % len(regressions))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
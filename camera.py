@@ -0,0 +1,35 @@
+class Camera():
+    """The part of a world that is on the screen, kept centred on the
+    player as far as the edges of the world allow"""
+    def __init__(self, world, width, height):
+        """Initialize the camera over the player
+
+        world: the world to look at
+        width: the width of the view in cells
+        height: the height of the view in cells"""
+        self.world = world
+        self.width = width
+        self.height = height
+        self.x = None # the cell in the top left corner of the view
+        self.y = None
+        self.pixel_origin = (0, 0) # the top left corner of the view in pixels
+        self.follow()
+
+    def follow(self):
+        """Move the view to keep the player in the middle. Returns True if
+        the view moved."""
+        world = self.world
+        player_x, player_y = world.player.cell_coordinates
+        x = min(max(player_x - self.width // 2, 0), world.width - self.width)
+        y = min(max(player_y - self.height // 2, 0), world.height - self.height)
+        if x == self.x and y == self.y:
+            return False
+        self.x = x
+        self.y = y
+        self.pixel_origin = (x * world.cell_size, y * world.cell_size)
+        return True
+
+    def is_visible(self, cell_coord):
+        """Checks if a cell is on the screen"""
+        return (self.x <= cell_coord[0] < self.x + self.width
+                and self.y <= cell_coord[1] < self.y + self.height)
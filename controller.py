@@ -1,41 +1,107 @@
 import pygame
+
+DIRECTIONS = ('up', 'down', 'left', 'right') # commands that move the player
+ACTIONS = ('sword',) # commands that make the player act
+
 class Player_Controller():
     """Defines a controller that takes user input to control the Player
     object.
     """
     def __init__(self):
         """Initialize the player controller"""
-        self.direction = {'up': False, 'down': False, 'left': False, 'right': False}
-        self.action = {'sword': False} #, 'shield': False}
+        self.direction = dict.fromkeys(DIRECTIONS, False)
+        self.action = dict.fromkeys(ACTIONS, False) #, 'shield': False}
+        self.active_direction = None # the direction that is True, if any
+        self.active_action = None # the action that is True, if any
+        self.pressed_since_tick = [] # directions and actions pressed since the last tick
+        self.pressed_last_tick = [] # reused for the next tick, so no new lists are made
+        self.times_since_tick = [] # when each command in pressed_since_tick was pressed, in milliseconds
+        self.times_last_tick = [] # when each command in the last list taken was pressed
+
+    def take_pressed(self):
+        """Get the directions and actions pressed since the last tick, and
+        start collecting them again for the next one. The list returned is
+        reused, so is only valid until the next call. The times they were
+        pressed are in times_last_tick."""
+        pressed = self.pressed_since_tick
+        self.pressed_since_tick = self.pressed_last_tick
+        self.pressed_since_tick.clear()
+        self.pressed_last_tick = pressed
+        times = self.times_since_tick
+        self.times_since_tick = self.times_last_tick
+        self.times_since_tick.clear()
+        self.times_last_tick = times
+        return pressed
+
+    def oldest_press(self):
+        """Get when the first command in the last list taken was pressed,
+        in milliseconds, None if nothing was pressed"""
+        if self.times_last_tick:
+            return self.times_last_tick[0] # pressed in order, so the first is the oldest
+        return None
+
+    def command(self, command, time=0):
+        """Start a direction or an action
+
+        command: the name of the direction or action
+        time: when it was pressed, in milliseconds"""
+        if command in self.direction:
+            self.set_direction(command, time)
+        elif command in self.action:
+            self.set_action(command, time)
+
+    def end_command(self, command):
+        """Stop a direction or an action
+
+        command: the name of the direction or action"""
+        if command in self.direction:
+            self.release_direction(command)
+        elif command in self.action:
+            self.release_action(command)
 
     def reset_direction(self):
         """Reset the pressed values"""
-        self.direction = {'up': False, 'down': False, 'left': False, 'right': False}
-
-    def set_direction(self, dir):
-        """Set the direction to move in"""
-        if dir == 'up':
-            self.reset_direction()
-            self.direction['up'] = True
-        elif dir == 'down':
-            self.reset_direction()
-            self.direction['down'] = True
-        elif dir == 'left':
-            self.reset_direction()
-            self.direction['left'] = True
-        elif dir == 'right':
-            self.reset_direction()
-            self.direction['right'] = True
+        if self.active_direction is not None: # only one is ever True
+            self.direction[self.active_direction] = False
+        self.active_direction = None
+
+    def release_direction(self, dir):
+        """Stop moving in a direction"""
+        self.direction[dir] = False
+        if self.active_direction == dir:
+            self.active_direction = None
+
+    def set_direction(self, dir, time=0):
+        """Set the direction to move in
+
+        time: when it was pressed, in milliseconds"""
+        self.pressed_since_tick.append(dir) # kept even if released before the tick
+        self.times_since_tick.append(time)
+        self.reset_direction()
+        self.direction[dir] = True
+        self.active_direction = dir
 
     def reset_action(self):
         """Reset the actions"""
-        self.action = {'sword': False}
+        if self.active_action is not None:
+            self.action[self.active_action] = False
+        self.active_action = None
+
+    def release_action(self, act):
+        """Stop doing an action"""
+        self.action[act] = False
+        if self.active_action == act:
+            self.active_action = None
 
-    def set_action(self, act):
-        """Sets the action of the player"""
-        if act == 'sword':
-            self.reset_action()
-            self.action['sword'] = True
+    def set_action(self, act, time=0):
+        """Sets the action of the player
+
+        time: when it was pressed, in milliseconds"""
+        self.pressed_since_tick.append(act) # kept even if released before the tick
+        self.times_since_tick.append(time)
+        self.reset_action()
+        self.action[act] = True
+        self.active_action = act
 
 class Arrow_Keys_Controller(Player_Controller):
     """Defines a controller that takes input from the keyboard arrow keys.
@@ -43,34 +109,40 @@ class Arrow_Keys_Controller(Player_Controller):
     def __init__(self):
         """Initialize the player controller"""
         super(Arrow_Keys_Controller, self).__init__() # uses the __init__ method from Controller()
-        self.move_up = [pygame.K_UP, pygame.K_w, pygame.K_COMMA]
-        self.move_down = [pygame.K_DOWN, pygame.K_s, pygame.K_o]
-        self.move_left = [pygame.K_LEFT, pygame.K_a]
-        self.move_right = [pygame.K_RIGHT, pygame.K_d, pygame.K_e]
-        self.sword = [pygame.K_SPACE]
-
-    def pressed (self, key):
-        """Check which key is pressed"""
-        if key in self.move_up:
-            self.set_direction('up')
-        elif key in self.move_down:
-            self.set_direction('down')
-        elif key in self.move_left:
-            self.set_direction('left')
-        elif key in self.move_right:
-            self.set_direction('right')
-        elif key in self.sword:
-            self.set_action('sword')
+        self.bindings = {} # key -> the command it gives
+        for key in (pygame.K_UP, pygame.K_w, pygame.K_COMMA):
+            self.bind(key, 'up')
+        for key in (pygame.K_DOWN, pygame.K_s, pygame.K_o):
+            self.bind(key, 'down')
+        for key in (pygame.K_LEFT, pygame.K_a):
+            self.bind(key, 'left')
+        for key in (pygame.K_RIGHT, pygame.K_d, pygame.K_e):
+            self.bind(key, 'right')
+        self.bind(pygame.K_SPACE, 'sword')
+
+    def bind(self, key, command):
+        """Make a key give a command, replacing what it gave before
+
+        key: the pygame key code
+        command: a direction or action"""
+        if command not in self.direction and command not in self.action:
+            raise ValueError('unknown command %r' % (command,))
+        self.bindings[key] = command
+
+    def unbind(self, key):
+        """Make a key do nothing"""
+        self.bindings.pop(key, None)
+
+    def pressed (self, key, time=0):
+        """Check which key is pressed
+
+        time: when it was pressed, in milliseconds"""
+        command = self.bindings.get(key)
+        if command is not None:
+            self.command(command, time)
 
     def released (self, key):
         """Check to see if an key is released"""
-        if key in self.move_up:
-            self.direction['up'] = False
-        elif key in self.move_down:
-            self.direction['down'] = False
-        elif key in self.move_left:
-            self.direction['left'] = False
-        elif key in self.move_right:
-            self.direction['right'] = False
-        elif key in self.sword:
-            self.action['sword'] = False
+        command = self.bindings.get(key)
+        if command is not None:
+            self.end_command(command)
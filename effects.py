@@ -0,0 +1,98 @@
+import pygame
+
+FLASH_COLOR = (255, 255, 255) # the color a cell flashes, ie when something in it is hit
+FLASH_ALPHA = 160 # how solid the flash is, out of 255
+
+class Effect():
+    """Something shown for a number of ticks, ie a sword swing or a hit
+    flash, then taken away. Effects are drawn by the renderer in the same
+    pass as the actors, and have no part in the game logic."""
+    def __init__(self, lifetime):
+        """Initialize the effect.
+        lifetime: the number of ticks to show it for"""
+        self.lifetime = lifetime
+        self.expires = None # the world tick it is taken away on, set when it starts
+
+    def draw(self, surface, world, alpha=1.0, origin=None):
+        """Draws the effect. Returns the area that was drawn, None if
+        nothing was, as for an effect with nothing to show.
+
+        alpha: how far through the time between ticks to draw
+        origin: the pixel position of the top left of the surface in the world"""
+        return None
+
+class Actor_Effect(Effect):
+    """Shows an actor that is not in the world, ie the sword while it swings"""
+    def __init__(self, actor, lifetime):
+        """Initialize the effect.
+        actor: the actor to show
+        lifetime: the number of ticks to show it for"""
+        super(Actor_Effect, self).__init__(lifetime) # uses the __init__ method from Effect()
+        self.actor = actor
+
+    def draw(self, surface, world, alpha=1.0, origin=None):
+        """Draws the actor"""
+        return self.actor.draw(surface, alpha, origin)
+
+class Flash_Effect(Effect):
+    """Lights up a cell, ie where something was hit or the door opened"""
+    images = {} # cell size -> the see through square drawn over the cell, shared by every flash
+
+    def __init__(self, cell_coord, lifetime):
+        """Initialize the effect.
+        cell_coord: the cell to light up
+        lifetime: the number of ticks to show it for"""
+        super(Flash_Effect, self).__init__(lifetime) # uses the __init__ method from Effect()
+        self.cell_coord = cell_coord
+        self.rect = None # made on the first draw, then moved rather than replaced
+
+    def draw(self, surface, world, alpha=1.0, origin=None):
+        """Draws the flash over the cell"""
+        image = self.images.get(world.cell_size)
+        if image is None:
+            image = pygame.Surface((world.cell_size, world.cell_size))
+            image.fill(FLASH_COLOR)
+            image.set_alpha(FLASH_ALPHA)
+            self.images[world.cell_size] = image
+        if self.rect is None:
+            self.rect = image.get_rect()
+        rect = self.rect
+        rect.topleft = world.cells[self.cell_coord].coordinates
+        if origin is not None:
+            rect.x -= origin[0]
+            rect.y -= origin[1]
+        surface.blit(image, rect)
+        return rect
+
+class Effect_Scheduler():
+    """The effects showing in a world. Each is taken away once its
+    lifetime in ticks has passed."""
+    def __init__(self, world):
+        """Initialize the scheduler with no effects
+        world: the world the effects are in"""
+        self.world = world
+        self.active = [] # the effects showing, oldest first
+
+    def add(self, effect):
+        """Start showing an effect, from now until its lifetime has passed"""
+        effect.expires = self.world.ticks + effect.lifetime
+        self.active.append(effect)
+
+    def expire(self):
+        """Take away the effects whose lifetime has passed, called each tick"""
+        active = self.active
+        if not active:
+            return
+        ticks = self.world.ticks
+        kept = 0
+        for effect in active: # keep the rest in place, so no new list is made
+            if effect.expires > ticks:
+                active[kept] = effect
+                kept += 1
+        del active[kept:]
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __len__(self):
+        return len(self.active)
@@ -1,43 +1,148 @@
+import argparse
 import pygame
 import random
-import time
+import threading
 import gameworld
+import ai
 import controller
+import profiler
+
+TICK_RATE = 8 # game logic ticks per second, sets the speed of the game
+FRAME_RATE = 60 # most frames drawn per second
+MAX_TICKS_PER_FRAME = 5 # ticks to catch up on at most, so a slow frame can not snowball
+PROFILE_FILE = 'frame_profile.csv' # where F4 writes the frame profile
+VIEW_SIZE = 15 # cells across the screen, bigger rooms scroll with the player
+LOW_RES_CELL_SIZE = 15 # pixels a cell's images are shrunk to when scaling up, a third of their size
+EVENT_TYPES = [pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP] # the only events handled, the rest are never queued
+
+class Room_Prefetcher():
+    """Builds a room in the background while the current one is being
+    played, so going through the door does not stall the game"""
+    def __init__(self, door_side, opening, level, **world_options):
+        """Start building the room
+
+        door_side: the side of the room the door is on
+        opening: the side of the room the player comes in from
+        level: the level of the room
+        world_options: other arguments for the world"""
+        self.door_side = door_side
+        self.opening = opening
+        self.level = level
+        self.world_options = world_options
+        self.world = None
+        self.error = None
+        self.thread = threading.Thread(target=self._build, daemon=True)
+        self.thread.start()
+
+    def _build(self):
+        """Build the room"""
+        try:
+            self.world = gameworld.Init_World(self.door_side, self.opening, self.level, **self.world_options)
+        except Exception as error: # raised again when the room is taken
+            self.error = error
+
+    def take(self):
+        """Wait for the room to be built, then return it"""
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.world
 
 class Game():
     """Class to manage the actor and gameworld classes"""
-    def __init__(self, door_side = random.randint(0, 3) * 90, opening = None, level = 1):
-        """Create the world"""
-        self.door_side = door_side
+    def __init__(self, door_side = None, opening = None, level = 1, headless = False,
+                 prefetch = None, seed = None, player_controller = None, size = 15,
+                 cell_size = 45, scale = 1, fullscreen = False, deterministic = None):
+        """Create the world
+
+        door_side: the side of the first room the door is on, random if None
+        headless: run without a display, ie for simulations and testing
+        prefetch: build the next room in the background, on by default
+            unless headless
+        seed: seed for the rooms, the same seed gives the same rooms.
+            Uses the random module if None
+        player_controller: the controller the player is moved by, the
+            keyboard if None
+        size: the width and height of the rooms in cells
+        cell_size: the dimensions of a cell in pixels, before scaling up
+        scale: how many times bigger to make the cells and their images
+        fullscreen: fill the display, scaled up as far as a whole number fits
+        deterministic: give every npc its turn however long it takes, so
+            the game plays the same on any machine, ie to record it. On by
+            default if headless"""
         self.level = level
-        self.world = gameworld.Init_World(door_side, opening, level) # initalize the world
-        self.controller = controller.Arrow_Keys_Controller()
+        self.size = size
+        self.cell_size = cell_size
+        self.headless = headless
+        if prefetch is None:
+            prefetch = not headless # headless games have no idle time to build in
+        self.prefetch = prefetch
+        self.seed = seed
+        if deterministic is None:
+            deterministic = headless
+        # with a budget, which far npcs act depends on how fast the machine is
+        self.ai_budget = None if deterministic else ai.DEFAULT_BUDGET
+        if seed is None:
+            self.random = random # the shared generator
+        else:
+            self.random = random.Random(seed) # picks the doors and the seed of each room
+        if door_side is None:
+            door_side = self.random.randint(0, 3) * 90
+        self.door_side = door_side
+        self.world = gameworld.Init_World(door_side, opening, level, size, size, headless=headless,
+                                          seed=self._room_seed(), view_size=(VIEW_SIZE, VIEW_SIZE),
+                                          ai_budget=self.ai_budget, cell_size=cell_size, scale=scale,
+                                          fullscreen=fullscreen) # initalize the world
+        self.update = gameworld.Update(self.world) # updates the world each tick
+        if player_controller is None:
+            player_controller = controller.Arrow_Keys_Controller()
+        self.controller = player_controller
+        self.recording = None # records the input of each tick, if set
         self.clock = pygame.time.Clock() # initialize the clock
+        self.next_room_builder = None # started once the first frame is drawn, so it does not hold it up
 
     def check_events(self, event):
         """Check the events"""
         if event.type is pygame.QUIT: # if the program is closed
             self.world.running = False
         elif event.type == pygame.KEYDOWN: # if a key is pressed
-            self.controller.pressed(event.key)
+            if event.key == pygame.K_F3: # show or hide the performance HUD
+                profiler.frames.toggle_hud()
+                self.world.renderer.invalidate() # clear away the HUD
+            elif event.key == pygame.K_F4: # save the frame profile
+                if profiler.frames.dump(PROFILE_FILE):
+                    print('frame profile written to %s' % PROFILE_FILE)
+                else:
+                    print('no frames profiled, press F3 to profile them first')
+            self.controller.pressed(event.key, pygame.time.get_ticks()) # events carry no time of their own
         elif event.type == pygame.KEYUP: # if a key is released
             self.controller.released(event.key)
 
-    def check_direction(self):
-        """Checks for an active direction"""
-        try: # finds the direction that is currently true
-            dir = list(self.controller.direction.keys())[list(self.controller.direction.values()).index(True)]
+    def check_direction(self, pressed=()):
+        """Checks for an active direction
+
+        pressed: the directions and actions pressed since the last tick"""
+        if pressed:
+            for dir in reversed(pressed):
+                if dir in self.controller.direction: # the last direction pressed wins
+                    self.world.player.move(dir)
+                    return
+        dir = self.controller.active_direction
+        if dir is not None:
             self.world.player.move(dir)
-        except ValueError: # if True is not in the list
-            pass
 
-    def check_actions(self):
-        """Checks for an active action"""
-        try: # finds the action that is currently true
-            act = list(self.controller.action.keys())[list(self.controller.action.values()).index(True)]
+    def check_actions(self, pressed=()):
+        """Checks for an active action
+
+        pressed: the directions and actions pressed since the last tick"""
+        if pressed:
+            for act in pressed:
+                if act in self.controller.action: # even if already released
+                    self.world.player.action(act)
+                    return
+        act = self.controller.active_action
+        if act is not None:
             self.world.player.action(act)
-        except ValueError: # if True is not in the list
-            pass
 
     def get_complementary_opening(self):
         """Get the opening for the next room"""
@@ -56,26 +161,144 @@ class Game():
         # find a door position that is not the opening
         door_side = open
         while door_side == open:
-            door_side = random.randint(0, 3) * 90
+            door_side = self.random.randint(0, 3) * 90
         return door_side
 
-def run_game(game):
+    def _room_seed(self):
+        """Get the seed for the next room, None if the game is not seeded"""
+        if self.seed is None:
+            return None
+        return self.random.getrandbits(32)
+
+    def _next_room_options(self):
+        """Get the arguments for building the next room, reusing the
+        window and cells of this one"""
+        return {'width': self.size, 'height': self.size, 'view_size': (VIEW_SIZE, VIEW_SIZE),
+                'renderer': self.world.renderer, 'cells': self.world.cells, 'seed': self._room_seed(),
+                'ai_budget': self.ai_budget, 'cell_size': self.cell_size}
+
+    def _prefetch_next_room(self):
+        """Start building the next room in the background"""
+        door_side = self.get_next_door()
+        opening = self.get_complementary_opening()
+        self.next_room_builder = Room_Prefetcher(
+            door_side, opening, self.level + 1, **self._next_room_options())
+
+    def next_room(self):
+        """Go through the open door into the next room"""
+        if self.next_room_builder is not None: # already being built
+            world = self.next_room_builder.take()
+            door_side = self.next_room_builder.door_side
+        else:
+            door_side = self.get_next_door()
+            opening = self.get_complementary_opening()
+            world = gameworld.Init_World(door_side, opening, self.level + 1, **self._next_room_options())
+        self.door_side = door_side
+        self.level += 1
+        self.world.teardown() # the room is left for good
+        self.world = world
+        self.update = gameworld.Update(self.world)
+        if self.prefetch:
+            self._prefetch_next_room()
+
+    def tick(self):
+        """Run one tick of the game logic: update the world, then act on the
+        controller"""
+        self.world.ticks += 1
+        profiler.frames.count_tick()
+        self.update._update()
+        started = profiler.frames.start()
+        pressed = self.controller.take_pressed()
+        oldest = self.controller.oldest_press()
+        if oldest is not None: # how long the input waited for this tick
+            profiler.frames.press_waited(pygame.time.get_ticks() - oldest)
+        if self.recording is not None:
+            self.recording.record(pressed, self.controller.active_direction, self.controller.active_action)
+        self.check_direction(pressed)
+        self.check_actions(pressed)
+        profiler.frames.stop('input', started)
+        if self.world.cleared: # if the world has been cleared
+            if self.world.player.cell_coordinates == self.world.door_position: # if the player is going through the door
+                self.next_room()
+        if self.world._is_deadly(self.world.player.cell_coordinates) == True:
+            self.world.running = False # close the world
+
+    def render(self, alpha=1.0):
+        """Draw the world
+
+        alpha: how far through the time between ticks to draw"""
+        self.world.renderer.render(self.world, alpha)
+        if profiler.frames.show_hud and self.world.screen is not None:
+            pygame.display.update(profiler.frames.draw_hud(self.world.renderer.display_surface()))
+        if self.prefetch and self.next_room_builder is None: # the first frame is out of the way
+            self._prefetch_next_room()
+
+def run_game(game, ticks=None):
+    """Run a game until the player dies or closes the window
+
+    ticks: stop after this many ticks, ie the length of a replay"""
+    tick_time = 1000 / TICK_RATE # milliseconds per tick
+    lag = 0 # milliseconds of game time not yet ticked
+    ticks_run = 0
+    if not game.headless:
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(EVENT_TYPES)
     while game.world.running:
-        game.clock.tick(8)
-        update = gameworld.Update(game.world)
-        for event in pygame.event.get():
-            game.check_events(event) # check the events
-        update._redraw()
-        game.check_direction()
-        game.check_actions()
-        if game.world.cleared: # if the world has been cleared
-            if game.world.player.cell_coordinates == game.world.open_door.cell_coordinates: # if the player is going through the door
-                game = Game(game.get_next_door(), game.get_complementary_opening(), game.level + 1)
-        if game.world._is_deadly(game.world.player.cell_coordinates) == True:
-            game.world.running = False # close the world
+        if ticks is not None and ticks_run >= ticks:
+            break
+        if game.headless: # headless games run as fast as possible, with no events
+            game.tick()
+            ticks_run += 1
+        else:
+            lag += game.clock.tick(FRAME_RATE)
+            profiler.frames.begin_frame()
+            started = profiler.frames.start()
+            for event in pygame.event.get(): # sampled every frame, queued for the next tick
+                game.check_events(event) # check the events
+            profiler.frames.stop('events', started)
+            lag = min(lag, tick_time * MAX_TICKS_PER_FRAME)
+            while lag >= tick_time and game.world.running:
+                game.tick()
+                ticks_run += 1
+                lag -= tick_time
+            game.render(lag / tick_time)
+            profiler.frames.end_frame(len(game.world.actors), game.world.ai)
         if game.world.running == False:
             print(game.level)
 
-if __name__ == "__main__":
-    game = Game()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play the game')
+    parser.add_argument('--seed', type=int, help='seed for the rooms, random if not given')
+    parser.add_argument('--size', type=int, default=15, help='width and height of the rooms in cells')
+    parser.add_argument('--scale', type=int,
+                        help='shrink the images to %d pixels a cell and scale them up by this' % LOW_RES_CELL_SIZE)
+    parser.add_argument('--fullscreen', action='store_true',
+                        help='fill the display, drawn at low resolution and scaled up to fit')
+    parser.add_argument('--record', help='file to save the seed and input of the session to, for replay.py')
+    parser.add_argument('--first-frame', action='store_true',
+                        help='quit once the first frame is drawn, to time starting the game')
+    args = parser.parse_args(argv)
+
+    seed = args.seed
+    if seed is None and args.record:
+        seed = random.getrandbits(32) # a recording needs a seed to replay from
+    cell_size = 45
+    scale = 1
+    if args.scale is not None or args.fullscreen: # small images, scaled up to fill the window
+        cell_size = LOW_RES_CELL_SIZE
+        scale = args.scale or 1
+    game = Game(seed=seed, size=args.size, cell_size=cell_size, scale=scale, fullscreen=args.fullscreen,
+                deterministic=bool(args.record)) # replays run without a budget, so recordings must too
+    if args.first_frame:
+        game.render()
+        return
+    if args.record:
+        import replay # only needed to record, so not loaded otherwise
+        game.recording = replay.Recording(seed, game.level, size=args.size)
     run_game(game)
+    if args.record:
+        game.recording.save(args.record, game)
+        print('recording written to %s' % args.record)
+
+if __name__ == "__main__":
+    main()
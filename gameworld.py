@@ -1,43 +1,356 @@
-import pygame
 import random
 import actors
+import render
+import profiler
+import grid_state
+import pathfinding
+import visibility
+import camera
+import tiles
+import effects
+import ai
+import spawner
+
+CHUNK_SIZE = 16 # cells per side of a chunk of the world
+DOOR_FLASH_TICKS = 2 # ticks the door flashes for when it opens
+SPAWN_ATTEMPTS = 4 # random cells tried for an npc before settling for one next to the player
+SPAWN_TYPES = ( # the class and image of each part of a wave, in the order spawner.wave_mix gives them
+    (actors.Npc, 'images/npc2.jpg'),
+    (actors.Grunt, 'images/npc1.jpg'),
+    (actors.Sentry, 'images/npc1.jpg'),
+    (actors.Chaser, 'images/npc1.jpg'),
+)
+CHASING_TYPES = (actors.Sentry, actors.Chaser) # npcs that take their turns after every grunt
+
+class Occupancy_Grid():
+    """Index of the actors standing in each cell of the world, kept up to
+    date as actors spawn, move and die"""
+    def __init__(self):
+        """Initialize an empty index"""
+        self.cells = {} # cell coordinate -> actors in that cell
+        self.obstacles = {} # cell coordinate -> number of obstacles in that cell
+        self.deadly = {} # cell coordinate -> number of deadly actors in that cell
+
+    def _increment(self, counts, cell_coord):
+        """Add one to the count for a cell"""
+        counts[cell_coord] = counts.get(cell_coord, 0) + 1
+
+    def _decrement(self, counts, cell_coord):
+        """Take one from the count for a cell, forgetting the cell at zero"""
+        if counts[cell_coord] == 1:
+            del counts[cell_coord]
+        else:
+            counts[cell_coord] -= 1
+
+    def add(self, actor, cell_coord):
+        """Add an actor to a cell"""
+        self.cells.setdefault(cell_coord, []).append(actor)
+        if actor.is_obstacle:
+            self._increment(self.obstacles, cell_coord)
+        if actor.deadly:
+            self._increment(self.deadly, cell_coord)
+
+    def remove(self, actor, cell_coord):
+        """Remove an actor from a cell"""
+        here = self.cells[cell_coord]
+        here.remove(actor)
+        if not here: # forget empty cells so the index stays small
+            del self.cells[cell_coord]
+        if actor.is_obstacle:
+            self._decrement(self.obstacles, cell_coord)
+        if actor.deadly:
+            self._decrement(self.deadly, cell_coord)
+
+    def move(self, actor, old_coord, new_coord):
+        """Move an actor from one cell to another. The same as remove then
+        add, written out as it is called for every step of every actor."""
+        cells = self.cells
+        here = cells[old_coord]
+        here.remove(actor)
+        if not here:
+            del cells[old_coord]
+        there = cells.get(new_coord)
+        if there is None:
+            cells[new_coord] = [actor]
+        else:
+            there.append(actor)
+        if actor.is_obstacle:
+            self._decrement(self.obstacles, old_coord)
+            self._increment(self.obstacles, new_coord)
+        if actor.deadly:
+            self._decrement(self.deadly, old_coord)
+            self._increment(self.deadly, new_coord)
+
+    def is_occupied(self, cell_coord):
+        """Checks if there is an obstacle in a cell"""
+        return cell_coord in self.obstacles
+
+    def is_deadly(self, cell_coord):
+        """Checks if there is a deadly actor in a cell"""
+        return cell_coord in self.deadly
+
+    def actors_at(self, cell_coord):
+        """Get the actors in a cell"""
+        return self.cells.get(cell_coord, ())
+
+class Chunked_Cells():
+    """The cells of a world, made a chunk at a time the first time
+    anything in the chunk is looked up, so a huge world only has cells
+    where it has been drawn"""
+    def __init__(self, width, height, cell_size, screen):
+        """Initialize the cells. None are made yet.
+
+        width: the width of the world in cells
+        height: the height of the world in cells
+        cell_size: the dimensions of a cell in pixels
+        screen: the screen the cells are drawn on"""
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.screen = screen
+        self.made = {} # cell coordinate -> cell, for the chunks made so far
+        self.chunks = set() # the chunks made so far
+
+    def _make_chunk(self, cell_coord):
+        """Make the cells of the chunk a cell is in"""
+        if cell_coord not in self:
+            raise KeyError(cell_coord)
+        chunk = (cell_coord[0] // CHUNK_SIZE, cell_coord[1] // CHUNK_SIZE)
+        self.chunks.add(chunk)
+        cell_size = (self.cell_size, self.cell_size)
+        for i in range(chunk[0] * CHUNK_SIZE, min((chunk[0] + 1) * CHUNK_SIZE, self.width)):
+            for j in range(chunk[1] * CHUNK_SIZE, min((chunk[1] + 1) * CHUNK_SIZE, self.height)):
+                cell_coord = (i * self.cell_size, j * self.cell_size) # get the coordinate of that cell
+                self.made[(i, j)] = actors.Cell(self.screen, cell_coord, cell_size)
+
+    def __getitem__(self, cell_coord):
+        cell = self.made.get(cell_coord)
+        if cell is None: # the first look in this chunk
+            self._make_chunk(cell_coord)
+            cell = self.made[cell_coord]
+        return cell
+
+    def get(self, cell_coord, default=None):
+        """Get a cell, or default if it is not in the world"""
+        if cell_coord not in self:
+            return default
+        return self[cell_coord]
+
+    def __contains__(self, cell_coord):
+        return 0 <= cell_coord[0] < self.width and 0 <= cell_coord[1] < self.height
+
+    def __iter__(self):
+        """Go through the coordinates of every cell, without making them"""
+        for i in range(self.width):
+            for j in range(self.height):
+                yield (i, j)
+
+    def __len__(self):
+        return self.width * self.height
+
+class Free_Cells():
+    """Pool of the cells nothing has been placed in yet, with constant time
+    removal and random choice, so placing things never has to retry.
+
+    The pool is an array of every cell, numbered x * height + y, with the
+    free ones at the front. Taking a cell out moves the last free cell into
+    its place, and only those moves are stored, so the pool is small even
+    for a huge world."""
+    def __init__(self, width, height):
+        """Start with every cell free
+
+        width: the width of the world in cells
+        height: the height of the world in cells"""
+        self.width = width
+        self.height = height
+        self.count = width * height # the cells numbered below this are free
+        self.moved = {} # index -> the cell moved there
+        self.positions = {} # cell coordinate -> its index, for the cells that were moved
+
+    def _cell_at(self, i):
+        """Get the cell at an index of the pool"""
+        cell_coord = self.moved.get(i)
+        if cell_coord is None:
+            return divmod(i, self.height)
+        return cell_coord
+
+    def _index_of(self, cell_coord):
+        """Get the index of a cell in the pool"""
+        i = self.positions.get(cell_coord)
+        if i is None:
+            return cell_coord[0] * self.height + cell_coord[1]
+        return i
+
+    def __contains__(self, cell_coord):
+        if not (0 <= cell_coord[0] < self.width and 0 <= cell_coord[1] < self.height):
+            return False
+        i = self._index_of(cell_coord)
+        return i < self.count and self._cell_at(i) == cell_coord
+
+    def __len__(self):
+        return self.count
+
+    def discard(self, cell_coord):
+        """Take a cell out of the pool, if it is in it"""
+        if cell_coord not in self:
+            return
+        i = self._index_of(cell_coord)
+        self.count -= 1
+        last = self._cell_at(self.count)
+        self.moved.pop(self.count, None)
+        self.positions.pop(cell_coord, None)
+        if i != self.count: # move the last free cell into the gap
+            self.moved[i] = last
+            self.positions[last] = i
+
+    def choice(self, rng):
+        """Get a random free cell, or None if there are none
+
+        rng: the random number generator to use"""
+        if not self.count:
+            return None
+        return self._cell_at(rng.randrange(self.count))
+
 class Init_World():
     """Initialize the world"""
-    def __init__(self, door_side, opening_side, level, width = 15, height = 15, cell_size=45):
+    def __init__(self, door_side, opening_side, level, width = 15, height = 15, cell_size=45,
+                 dirty_rects=True, headless=False, renderer=None, cells=None, vectorized=False,
+                 seed=None, view_size=None, ai_budget=None, scale=1, fullscreen=False):
         """Initialize the world.
         width: The width of the world in cells
         height: The height of the world in cells
-        cell_size: The dimensions of the cell in pixels"""
-        pygame.init() # initialize the pygame module
+        cell_size: The dimensions of the cell in pixels
+        dirty_rects: only redraw the parts of the screen that change
+        headless: run without a display, nothing is drawn
+        renderer: the renderer to draw with, chosen from the other options if None
+        cells: the cells of a world of the same size to reuse
+        vectorized: keep an array-backed copy of the world and move all of
+            the grunts in one step, needs numpy
+        seed: seed for generating the room, the same seed gives the same
+            room. Uses the random module if None
+        view_size: the (width, height) in cells that fits on the screen. A
+            bigger world scrolls with the player, and only what is on the
+            screen is drawn. The whole world fits if None
+        ai_budget: the seconds each tick may spend on npcs off the screen,
+            no limit if None
+        scale: make the window this whole number times bigger, with the
+            cells and images scaled up to fill it. The images are shrunk to
+            fit cell_size and scaled up once, so a big window looks drawn at
+            a low resolution and costs little more to draw than a small one
+        fullscreen: fill the display, scaled up as far as a whole number fits"""
+        self._init_state(door_side, opening_side, level, width, height, cell_size, dirty_rects,
+                         headless, renderer, cells, seed, view_size, ai_budget, scale, fullscreen)
+        self.free_cells = Free_Cells(width, height) # only kept up to date while generating
+        self._init_door()
+        self._init_opening()
+        self._init_border()
+        self._init_hills()
+        self._init_player()
+        self._init_npcs()
+        self.free_cells = None # generated, so the pool would go stale
+        self._init_finish(vectorized)
+
+    def _init_state(self, door_side, opening_side, level, width, height, cell_size, dirty_rects,
+                    headless, renderer, cells, seed, view_size, ai_budget=None, scale=1, fullscreen=False):
+        """Set up the parts of the world that come before anything is placed
+        in it: the renderer, the screen, the indexes and the cells. Takes
+        the same arguments as __init__."""
         self.door_side = door_side
         self.opening_side = opening_side
         self.level = level
-        screen_size = (height * cell_size, width * cell_size)
-        self.screen = pygame.display.set_mode(screen_size)
-        self.actors = []
+        if seed is None:
+            self.random = random # the shared generator
+        else:
+            self.random = random.Random(seed) # a generator of its own, so nothing else changes the room
+        scrolls = view_size is not None and (view_size[0] < width or view_size[1] < height)
+        if renderer is None:
+            if headless:
+                renderer = render.Null_Renderer()
+            elif scrolls:
+                renderer = render.Camera_Renderer(scale, fullscreen)
+            elif dirty_rects:
+                renderer = render.Dirty_Rect_Renderer(scale, fullscreen)
+            else:
+                renderer = render.Screen_Renderer(scale, fullscreen)
+        self.renderer = renderer
+        self.headless = renderer.headless # skip loading images if nothing is drawn
+        if scrolls:
+            view_size = (min(view_size[0], width), min(view_size[1], height))
+            screen_size = (view_size[0] * cell_size, view_size[1] * cell_size)
+        else:
+            view_size = None # the whole world is on the screen
+            screen_size = (height * cell_size, width * cell_size)
+        self.view_size = view_size
+        self.screen = renderer.open(screen_size)
+        self.scale = renderer.scale # as far as the display fits, which may be less than asked for
+        self.actors = [] # the actors in the world, each the only record of where it is
+        self.npcs = [] # the npcs in self.actors, in the order they take their turns, so a tick need not go through them all
+        self.chasing = 0 # the number of sentries and chasers in self.npcs
+        self.occupancy = Occupancy_Grid() # which actors are in each cell
+        self.tiles = tiles.Tile_Grid() # walls, doors and hills, which are not actors
+        self.grid_state = None # array-backed copy of the world, if vectorized
+        self.static_version = 0 # changes whenever a tile or static actor is added or removed
+        self.free_cells = None # the cells nothing has been placed in, while generating
+        self.effects = effects.Effect_Scheduler(self) # swings, flashes and the like being shown
+        self.ai = ai.AI_Scheduler(self, ai_budget) # decides which npcs act each tick
         # self.actors_position = []
         # set the dimensions of the world
         self.width = width
         self.height = height
-        self.cell_size = cell_size
-        self._init_cells() # creates the cells
-        self._init_door()
-        self._init_opening()
-        self._init_border()
-        self._init_hills()
-        self._init_player()
-        self._init_npcs()
+        self.cell_size = cell_size * self.scale # pixels across a cell on the screen
+        self.sprite_size = actors.sprite_size(cell_size) # images are scaled down to fit small cells, then up by the scale
+        self._init_cells(cells) # creates the cells
+
+    def _init_finish(self, vectorized=False):
+        """Set up the parts of the world worked out from what was placed in
+        it, once everything has been
+
+        vectorized: keep an array-backed copy of the world"""
+        self.flow_field = pathfinding.Flow_Field(self) # the way to the player, for chasing npcs
+        self.visibility = visibility.Visibility_Map(self) # where the player can be seen from
+        if self.view_size is not None:
+            self.camera = camera.Camera(self, self.view_size[0], self.view_size[1]) # follows the player
+        else:
+            self.camera = None # the whole world is on the screen
+        if vectorized: # grunts are tracked by the grid state from now on
+            self.grid_state = grid_state.Grid_State(self)
+        self.ticks = 0 # number of game logic ticks run in this room
         self.running = True # set the program to run
         self.cleared = False # room cleared to false
 
-    def _init_cells(self):
-        """Creates all of the cells, getting positions for each cell"""
-        self.cells = {}
-        cell_size = (self.cell_size, self.cell_size)
-        for i in range(self.height): # go through all rows
-            for j in range(self.width): # go through all columns in the row
-                cell_coord = (i * self.cell_size, j * self.cell_size) # get the coordinate of that cell
-                self.cells[(i, j)] = actors.Cell(self.screen, cell_coord, cell_size) # create the cell and add it to the list
+    def _init_cells(self, cells=None):
+        """Creates the cells, which make themselves a chunk at a time as
+        they are used
+
+        cells: existing cells to reuse instead"""
+        if cells is not None: # the cells never change, so rooms can share them
+            self.cells = cells
+            return
+        self.cells = Chunked_Cells(self.width, self.height, self.cell_size, self.screen)
+
+    def teardown(self):
+        """Let go of everything in a finished room, so nothing from it
+        lives on once the next room is played. The npcs go back to the
+        shared pool and the actors lose their way back to the world. The
+        cells and the renderer are shared with the next room, so are kept."""
+        spawner.pool.release_all(self.npcs)
+        for actor in self.actors:
+            actor.world = None
+        self.actors.clear()
+        self.npcs.clear()
+        self.chasing = 0
+        self.player.sword = None # the last swing
+        self.player.world = None
+        self.occupancy = Occupancy_Grid()
+        self.tiles = tiles.Tile_Grid()
+        self.effects.active.clear()
+        self.ai.near.clear()
+        self.grid_state = None
+        self.flow_field = None
+        self.visibility = None
+        self.camera = None
+        self.renderer.invalidate() # it may still hold the room's static layer
+        self.running = False
 
     def _add_coords(self, a, b):
         """Rewrites the current location to the place it needs to go.
@@ -52,20 +365,79 @@ class Init_World():
         """
         return tuple(map(sum, zip(a, b)))
 
+    def add_actor(self, actor):
+        """Add an actor to the world and index the cell it is in"""
+        self.actors.append(actor)
+        if isinstance(actor, actors.Npc):
+            self._add_npc(actor)
+        if self.free_cells is not None: # generating
+            self.free_cells.discard(actor.cell_coordinates)
+        if self.grid_state is not None and self.grid_state.tracks(actor):
+            self.grid_state.add_grunt(actor)
+        else:
+            self._index_actor(actor)
+            if self.grid_state is not None and self._is_in_grid(actor.cell_coordinates):
+                self.grid_state.update_cell(actor.cell_coordinates)
+        if actor.is_static:
+            self.static_version += 1 # the static layer needs redrawing
+
+    def _add_npc(self, npc):
+        """Add an npc to the order the npcs take their turns in. Grunts go
+        ahead of every sentry and chaser, so that moving all of the grunts
+        in one step before the rest, as a vectorized world does, is the
+        same as each taking its turn. In a generated room they already are."""
+        npcs = self.npcs
+        if type(npc) == actors.Grunt and self.chasing:
+            for i, other in enumerate(npcs):
+                if type(other) in CHASING_TYPES:
+                    npcs.insert(i, npc)
+                    return
+        npcs.append(npc)
+        if type(npc) in CHASING_TYPES:
+            self.chasing += 1
+
+    def _index_actor(self, actor):
+        """Track an actor in the occupancy index as it moves"""
+        self.occupancy.add(actor, actor.cell_coordinates)
+        actor.in_world = True
+
+    def remove_actor(self, actor):
+        """Remove an actor from the world"""
+        self.actors.remove(actor)
+        if isinstance(actor, actors.Npc):
+            self.npcs.remove(actor)
+            if type(actor) in CHASING_TYPES:
+                self.chasing -= 1
+        if self.grid_state is not None and self.grid_state.tracks(actor):
+            self.grid_state.remove_grunt(actor)
+        else:
+            self.occupancy.remove(actor, actor.cell_coordinates)
+            actor.in_world = False
+            if self.grid_state is not None and self._is_in_grid(actor.cell_coordinates):
+                self.grid_state.update_cell(actor.cell_coordinates)
+        if actor.is_static:
+            self.static_version += 1 # the static layer needs redrawing
+
+    def place_tile(self, cell_coord, tile):
+        """Put a tile in a cell, replacing the one there
+
+        tile: the tile type, tiles.EMPTY to clear the cell"""
+        self.tiles.set(cell_coord, tile)
+        if self.free_cells is not None: # generating
+            self.free_cells.discard(cell_coord)
+        if self.grid_state is not None and self._is_in_grid(cell_coord):
+            self.grid_state.update_cell(cell_coord)
+        self.static_version += 1 # the static layer needs redrawing
+
     def _is_occupied(self, cell_coord):
         """Checks if a space is occupied by a tile."""
         if cell_coord == self.opening_position:
             return True
-        try:
-            # fix to new method
-            for actor in self.actors:
-                if actor[1] == cell_coord:
-                    return actor[0].is_obstacle
-            # pos = self.actors_position.index(cell_coord) # get the position of the coord in the list
-            # actor = self.actors[pos] # get the actor that is at that coord
-            # return actor.is_obstacle # if obstacle, true, else False
-        except ValueError: # if the actor does not exist
-            return False
+        if self.occupancy.is_occupied(cell_coord):
+            return True
+        if self.tiles.is_obstacle(cell_coord):
+            return True
+        return self.grid_state is not None and self.grid_state.grunt_in(cell_coord) is not None
 
     def _get_door_location(self, door_side):
         """Determine the opening location, the places not to place wall
@@ -79,61 +451,56 @@ class Init_World():
         return pos.get(door_side)
 
     def _init_door(self):
-        """Initialize the door and add to actors"""
+        """Initialize the door"""
         self.door_position = self._get_door_location(self.door_side)
-        self.door = actors.Actor(self.door_position, self, './images/door.jpg') # create the door object
-        self.actors.append((self.door, self.door.cell_coordinates))
-        # self.actors_position.append(self.door.cell_coordinates)
+        self.place_tile(self.door_position, tiles.DOOR)
 
     def _init_opening(self):
         """Initialize the opening"""
         if self.opening_side != None:
             self.opening_position = self._get_door_location(self.opening_side)
+            self.free_cells.discard(self.opening_position) # kept clear to walk in from
         else:
             self.opening_position = None
 
     def open_door(self):
         """Replace the door with an open door"""
-        del self.actors[0]     # door is the first item added
-        self.open_door = actors.Actor(self.door_position, self, './images/sludge.jpg')
-        self.actors.append((self.open_door, self.open_door.cell_coordinates))
+        self.place_tile(self.door_position, tiles.OPEN_DOOR)
+        self.effects.add(effects.Flash_Effect(self.door_position, DOOR_FLASH_TICKS))
         self.space_before_opening = self.door_position
 
     def _init_border(self):
-        """Initialize the border and add to actors. Assumes the world is square"""
+        """Initialize the border walls. Assumes the world is square"""
         for x in range(self.width): # go through the width of the border spaces
             for y in range(0, self.height, self.height-1): # go through the top and bottom
                 if not self._is_occupied((x, y)):
-                    self.border = actors.Actor((x, y), self, './images/wall.jpg') # go horizontally
-                    self.actors.append((self.border, self.border.cell_coordinates))
-                    # self.actors_position.append(self.border.cell_coordinates)
+                    self.place_tile((x, y), tiles.WALL) # go horizontally
                 if not self._is_occupied((y, x)):
-                    self.border = actors.Actor((y, x), self, './images/wall.jpg') # go vertically
-                    self.actors.append((self.border, self.border.cell_coordinates))
-                    #self.actors_position.append(self.border.cell_coordinates)
+                    self.place_tile((y, x), tiles.WALL) # go vertically
 
-    def _init_hills(self, hill_count = random.randint(3, 6)):
-        """Initialize a random number of hills in random places"""
-        pos = {
-            0: (2, self.height-5),
-            1: (2, self.height-6),
-            2: (self.width-5, 2),
-            3: (3, self.height-6),
-            4: (self.width-5, 3),
-            5: (self.width-5, 4)
-        }
-        for hill in range(hill_count):
-            place = random.choice(pos)
-            for actor in self.actors:
-                while place in actor[1]: # while the space is occupied
-                    place = random.choice(pos) # generate more choices
-            self.hill = actors.Hill(place, self, './images/hill.jpg')
-            self.actors.append((self.hill, self.hill.cell_coordinates))
-            # self.actors_position.append(self.hill.cell_coordinates)
+    def _init_hills(self, hill_count = None):
+        """Initialize a random number of hills in random places
+
+        hill_count: the number of hills, 3 to 6 at random if None"""
+        if hill_count is None:
+            hill_count = self.random.randint(3, 6)
+        pos = [
+            (2, self.height-5),
+            (2, self.height-6),
+            (self.width-5, 2),
+            (3, self.height-6),
+            (self.width-5, 3),
+            (self.width-5, 4)
+        ]
+        places = [place for place in pos if place in self.free_cells] # small rooms have fewer
+        for place in self.random.sample(places, min(hill_count, len(places))):
+            self.place_tile(place, tiles.HILL)
 
     def _init_player(self):
         """Initialize the player at the center of the map"""
         self.player = actors.Player((int(self.height/2), int(self.width/2)), self, './images/player.jpg') # create the player
+        self._index_actor(self.player) # drawn separately, so not in self.actors
+        self.free_cells.discard(self.player.cell_coordinates) # do not spawn on the player
         # need to randomize location, but consider not spawning in impassible objects
 
     def _npc_locations(self, npc_position): #will need to change to reflect number of squares on map
@@ -145,26 +512,28 @@ class Init_World():
             4: (self.width-3, self.height-3),
         }
         position = pos.get(npc_position)
-        while self._is_occupied(position) == True:
-            position = pos.get(npc_position)
+        if position not in self.free_cells: # taken, ie by another npc
+            for attempt in range(SPAWN_ATTEMPTS):
+                position = self.free_cells.choice(self.random) # None if the room is full
+                if position is None or not self._next_to_player(position):
+                    break
         return position
 
+    def _next_to_player(self, cell_coord):
+        """Checks if a cell touches the player's, even at a corner"""
+        x, y = self.player.cell_coordinates
+        return abs(cell_coord[0] - x) <= 1 and abs(cell_coord[1] - y) <= 1
+
     def _init_npcs(self):
-        """Initialize the npcs on the map"""
-        for i in range(self.level):
-            if i == 0 or i ==2: # spawn up to two npcs
-                npc = actors.Npc(self._npc_locations(npc_position = random.randint(1, 4)), self, 'images/npc2.jpg')
-            elif i == 1:
-                # spawn lava
-                pass
-            elif 3 <= i >= 4: # spawn up to two ghosts
-                pass
-            elif i >= 5: # if on the fifth level
-                pass
-                # should exit the loop now
-            if not self._is_occupied(npc.cell_coordinates): # if the spot is not already occupied (probably by an npc)
-                self.actors.append((npc, npc.cell_coordinates))
-                #self.actors_position.append(npc.cell_coordinates)
+        """Spawn the wave of npcs for the room's level, taken from the
+        shared pool where it has any"""
+        size = spawner.wave_size(self.level, len(self.free_cells))
+        for (cls, image), count in zip(SPAWN_TYPES, spawner.wave_mix(self.level, size)):
+            for i in range(count):
+                position = self._npc_locations(npc_position = self.random.randint(1, 4))
+                if position is None: # nowhere left to spawn
+                    return
+                self.add_actor(spawner.pool.acquire(cls, position, self, image))
 
     def _is_in_grid(self, cell_coord):
         """Tells whether cell_coord is valid and in range of the actual grid dimensions."""
@@ -174,15 +543,18 @@ class Init_World():
 
     def _is_deadly(self, cell_coord):
         """Checks if a space is deadly."""
-        try:
-            for actor in self.actors:
-                if actor[1] == cell_coord:
-                    return actor[0].deadly
-            # pos = self.actors_position.index(cell_coord) # get the position of the coord in the list
-            # actor = self.actors[pos] # get the actor that is at that coord
-            # return actor.deadly # if obstacle is deadly
-        except ValueError: # if the actor does not exist
-            return False
+        if self.occupancy.is_deadly(cell_coord):
+            return True
+        return self.grid_state is not None and self.grid_state.grunt_in(cell_coord) is not None
+
+    def actors_at(self, cell_coord):
+        """Get the actors in a space"""
+        here = self.occupancy.actors_at(cell_coord)
+        if self.grid_state is not None:
+            grunt = self.grid_state.grunt_in(cell_coord)
+            if grunt is not None:
+                return list(here) + [grunt]
+        return here
 
 class Update(Init_World):
     """Class to update the world for each frame"""
@@ -194,16 +566,14 @@ class Update(Init_World):
         self.player = world.player
         self.screen = world.screen
 
-    def _draw_background(self):
-        """Sets the background color"""
-        COLOR = (252, 216, 169) # the beige from the legend of zelda games
-        self.screen.fill(COLOR)
-
     def _npc_actions(self):
-        """Execute the action of each npc"""
-        for actor in self.actors: # itterate through each actor
-            if type(actor[0]) == actors.Grunt:
-                actor[0].action()
+        """Execute the action of each npc whose turn it is, as the world's
+        AI scheduler decides. Vectorized grunts are cheap enough to always
+        move, all in one step, which comes first as they are ahead of the
+        other npcs that move in world.npcs."""
+        if self.world.grid_state is not None: # every grunt in one step
+            self.world.grid_state.step_grunts()
+        self.world.ai.run()
 
     # def _check_movement(self, actor):
     #     """Check if an item has moved, if it has, update the position"""
@@ -211,32 +581,21 @@ class Update(Init_World):
     #     if self.actors[pos] != actor.cell_coordinates: # if the position is not updated
     #         self.actors[pos] = actor.cell_coordinates # update the position
 
-    def _draw_actors(self):
-        """Draws the actors"""
-        for actor in self.actors: # itterate through each actor
-            #if type(actor) == actors.Npc or type(actor) == actors.Grunt:
-            #    self._check_movement(actor) # check if the object has moved, if not do not update
-            actor[0].draw() # draw each actor
-        actor = self.player
-        actor.draw()
-
     def _check_clear(self):
         """Checks if the world is clear of npcs"""
         if self.world.cleared == True: # if have already cleared the world
             return True
         # check if there are npcs in the world
-        npc = False
-        for actor in self.actors:
-            if type(actor[0]) == actors.Grunt or type(actor[0]) == actors.Npc:
-                npc = True
-        if not npc:
+        if not self.world.npcs:
             self.world.cleared = True
             self.world.open_door()
 
-    def _redraw(self):
-        """Updates the world view"""
-        self._draw_background()
+    def _update(self):
+        """Updates the world by one tick, without drawing it"""
+        self.world.effects.expire()
+        started = profiler.frames.start()
         self._npc_actions()
-        self._draw_actors()
+        profiler.frames.stop('npc_actions', started)
+        started = profiler.frames.start()
         self._check_clear()
-        pygame.display.update()
+        profiler.frames.stop('check_clear', started)
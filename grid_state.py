@@ -0,0 +1,213 @@
+try:
+    import numpy
+except ImportError: # only needed for vectorized worlds
+    numpy = None
+import actors
+import tiles
+
+# tile types, the world's own and one for cells with an npc that is not a grunt
+EMPTY = tiles.EMPTY
+WALL = tiles.WALL
+HILL = tiles.HILL
+DOOR = tiles.DOOR
+OPEN_DOOR = tiles.OPEN_DOOR
+NPC = 5
+
+DIRECTIONS = ('up', 'left', 'down', 'right') # index * 90 is the facing angle
+
+class Grid_State():
+    """Array-backed copy of a world's state that steps every grunt at once.
+    Grids are indexed [x, y]. The grunts are stepped exactly as if each one
+    had called Grunt.action in the order they are in world.npcs, where the
+    world keeps them ahead of the sentries and chasers, so stepping them
+    before those take their turns is the same as every npc taking its turn
+    in order. With a camera the far npcs take turns and the grunts do not,
+    so the two only match while the whole world is on the screen.
+
+    Grunts are tracked here instead of in the world's occupancy index, so
+    moving thousands of them does not mean thousands of index updates."""
+    def __init__(self, world):
+        """Build the arrays for a world
+
+        world: the world to copy"""
+        if numpy is None:
+            raise ImportError('the array-backed world state needs numpy')
+        self.world = world
+        self.deltas = numpy.array([(0, -1), (-1, 0), (0, 1), (1, 0)], numpy.int32) # per direction
+        self.rebuild()
+
+    def tracks(self, actor):
+        """Checks if an actor is tracked here rather than in the occupancy index"""
+        return type(actor) == actors.Grunt # the same grunts _npc_actions moves
+
+    def rebuild(self):
+        """Copy the world into the arrays, taking over tracking its grunts"""
+        world = self.world
+        shape = (world.width, world.height)
+        self.tile = numpy.zeros(shape, numpy.int8) # tile type of each cell
+        self.obstacle = numpy.zeros(shape, bool) # cells blocked by anything but a grunt
+        self.static_deadly = numpy.zeros(shape, bool) # cells deadly because of anything but a grunt
+        self.grunt_at = numpy.full(shape, -1, numpy.int32) # index of the grunt in each cell
+        self.deadly = numpy.zeros(shape, bool) # cells that kill the player, grunts included
+        self.grunts = []
+        for cell_coord, tile in world.tiles.items():
+            if self._in_grid(cell_coord):
+                self.update_cell(cell_coord)
+        for actor in world.actors:
+            if self.tracks(actor):
+                if actor.in_world: # take it out of the occupancy index
+                    world.occupancy.remove(actor, actor.cell_coordinates)
+                    actor.in_world = False
+                self.grunts.append(actor)
+            else:
+                self.update_cell(actor.cell_coordinates)
+        if world.opening_position is not None: # nothing stands in the way in
+            self.update_cell(world.opening_position)
+        for i, grunt in enumerate(self.grunts):
+            self.grunt_at[grunt.cell_coordinates] = i
+            self.deadly[grunt.cell_coordinates] = True
+        self.arrays_stale = True
+
+    def update_cell(self, cell_coord):
+        """Copy a cell's tile, and its actors other than grunts from the
+        occupancy index"""
+        world = self.world
+        tile = world.tiles.get(cell_coord)
+        for actor in world.occupancy.actors_at(cell_coord):
+            if isinstance(actor, actors.Npc):
+                tile = NPC
+        self.tile[cell_coord] = tile
+        self.obstacle[cell_coord] = (world.occupancy.is_occupied(cell_coord) or world.tiles.is_obstacle(cell_coord)
+                                     or cell_coord == world.opening_position) # the way in counts as occupied
+        self.static_deadly[cell_coord] = world.occupancy.is_deadly(cell_coord)
+        self.deadly[cell_coord] = self.static_deadly[cell_coord] or self.grunt_at[cell_coord] >= 0
+
+    def add_grunt(self, grunt):
+        """Start tracking a grunt, after the others"""
+        self.grunt_at[grunt.cell_coordinates] = len(self.grunts)
+        self.deadly[grunt.cell_coordinates] = True
+        self.grunts.append(grunt)
+        self.arrays_stale = True
+
+    def remove_grunt(self, grunt):
+        """Stop tracking a grunt"""
+        i = self.grunts.index(grunt)
+        del self.grunts[i]
+        cell_coord = grunt.cell_coordinates
+        self.grunt_at[cell_coord] = -1
+        self.grunt_at[self.grunt_at > i] -= 1 # the grunts after it move up one
+        self.deadly[cell_coord] = self.static_deadly[cell_coord]
+        self.arrays_stale = True
+
+    def _in_grid(self, cell_coord):
+        """Checks if a cell is in the grid, as negative indices would wrap"""
+        width, height = self.tile.shape
+        return 0 <= cell_coord[0] < width and 0 <= cell_coord[1] < height
+
+    def grunt_in(self, cell_coord):
+        """Get the grunt in a cell, or None"""
+        if not self._in_grid(cell_coord):
+            return None
+        i = self.grunt_at[cell_coord]
+        if i < 0:
+            return None
+        return self.grunts[i]
+
+    def _refresh_arrays(self):
+        """Copy the grunts' positions, directions and facings into arrays"""
+        count = len(self.grunts)
+        self.indices = numpy.arange(count)
+        self.positions = numpy.array([grunt.cell_coordinates for grunt in self.grunts],
+                                     numpy.int32).reshape(count, 2)
+        self.directions = numpy.array([DIRECTIONS.index(grunt.move_dir) for grunt in self.grunts], numpy.int32)
+        self.facings = numpy.array([grunt.facing // 90 for grunt in self.grunts], numpy.int32)
+        self.arrays_stale = False
+
+    def _look(self, cells):
+        """Get which cells are in the grid, and the cells clipped to the grid
+        so they can be used as indices"""
+        width, height = self.tile.shape
+        x = cells[:, 0]
+        y = cells[:, 1]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        return inside, numpy.clip(x, 0, width - 1), numpy.clip(y, 0, height - 1)
+
+    def _resolve_moves(self, trying, occupant, cell_id):
+        """Work out which grunts move, as if they took turns in index order.
+        A grunt can move into a cell if the grunt that was in it has
+        already moved away, and no grunt before it has moved in. Each round
+        settles the grunts whose cell's old occupant has been settled.
+
+        trying: grunts trying to move that are not blocked by the world
+            or by a grunt that has not had its turn yet
+        occupant: index of the grunt in each target cell, or -1
+        cell_id: a number for each target cell"""
+        moved = numpy.zeros(len(trying), bool)
+        undecided = trying.copy()
+        has_occupant = occupant >= 0
+        occupant = numpy.where(has_occupant, occupant, 0)
+        while undecided.any():
+            ready = undecided & (~has_occupant | ~undecided[occupant])
+            free = numpy.nonzero(ready & (~has_occupant | moved[occupant]))[0]
+            if free.size: # the first grunt into each cell gets it
+                first = numpy.unique(cell_id[free], return_index=True)[1]
+                moved[free[first]] = True
+            undecided &= ~ready
+        return moved
+
+    def step_grunts(self):
+        """Move every grunt one tick, the same as Grunt.action"""
+        if not self.grunts:
+            return
+        if self.arrays_stale: # grunts were added or removed
+            self._refresh_arrays()
+        indices = self.indices
+        directions = self.directions
+        rotating = self.facings != directions # turn to face the way they walk instead of moving
+        self.facings[rotating] = directions[rotating]
+
+        targets = self.positions + self.deltas[directions]
+        inside, x, y = self._look(targets)
+        occupant = numpy.where(inside, self.grunt_at[x, y], -1)
+        trying = ~rotating & inside & ~self.obstacle[x, y] & (occupant < indices)
+        moved = self._resolve_moves(trying, occupant, x * self.tile.shape[1] + y)
+
+        old_at = self.grunt_at
+        new_at = old_at.copy()
+        new_positions = self.positions.copy()
+        new_positions[moved] = targets[moved]
+        old_x, old_y = self.positions[moved, 0], self.positions[moved, 1]
+        new_at[old_x, old_y] = -1
+        new_at[new_positions[moved, 0], new_positions[moved, 1]] = indices[moved]
+
+        # turn around if the next space is occupied when the grunt has its
+        # turn: earlier grunts are where they moved to, later ones where they were
+        inside, x, y = self._look(new_positions + self.deltas[directions])
+        later = numpy.where(inside, old_at[x, y], -1) > indices
+        earlier = numpy.where(inside, new_at[x, y], -1)
+        earlier = (earlier >= 0) & (earlier < indices)
+        turning = inside & (self.obstacle[x, y] | later | earlier)
+        directions[turning] = (directions[turning] + 2) % 4
+
+        self.deadly[old_x, old_y] = self.static_deadly[old_x, old_y]
+        self.deadly[new_positions[moved, 0], new_positions[moved, 1]] = True
+        self.grunt_at = new_at
+        self.positions = new_positions
+        self._write_back(moved, rotating, turning)
+
+    def _write_back(self, moved, rotating, turning):
+        """Copy the changes back onto the grunt objects"""
+        grunts = self.grunts
+        ticks = self.world.ticks
+        changed = numpy.nonzero(moved)[0] # only the changed grunts are copied out of numpy
+        for i, position in zip(changed.tolist(), self.positions[changed].tolist()):
+            grunt = grunts[i]
+            grunt.last_coordinates = grunt.cell_coordinates # drawn moving from here until the next tick
+            grunt.moved_tick = ticks
+            grunt.cell_coordinates = tuple(position)
+        changed = numpy.nonzero(rotating)[0]
+        for i, facing in zip(changed.tolist(), self.facings[changed].tolist()):
+            grunts[i].turn(facing * 90)
+        changed = numpy.nonzero(turning)[0]
+        for i, direction in zip(changed.tolist(), self.directions[changed].tolist()):
+            grunts[i].move_dir = DIRECTIONS[direction]
@@ -0,0 +1,208 @@
+"""Accounting of the memory a game holds on to from room to room.
+
+Run "python memory.py --rooms 1000" to play that many rooms headless,
+tearing each down as the game goes through its door. It prints the live
+actors, surfaces and bytes every so often, and fails if the memory in use
+keeps growing once the first rooms are out of the way. Add --diff to
+also print where the memory grew between rooms, from tracemalloc."""
+import argparse
+import csv
+import gc
+import sys
+import tracemalloc
+import actors
+import assets
+import effects
+import game
+import gameworld
+import spawner
+
+WARMUP_ROOMS = 50 # rooms played before the memory is expected to stay flat
+TOLERANCE = 256 # KiB the memory in use may grow by after the warm up rooms
+DIFF_LINES = 5 # lines of each tracemalloc diff to print
+
+def count_live():
+    """Count the live actors and worlds by class, found through the
+    garbage collector, so what is left over from old rooms is counted"""
+    counts = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, (actors.Actor, gameworld.Init_World)):
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+def surface_bytes(surface):
+    """Get the bytes of pixels a surface holds"""
+    return surface.get_pitch() * surface.get_height()
+
+def shared_surfaces(renderer=None):
+    """Get the number of surfaces and the bytes of pixels held by the
+    sprite cache, the flash effects and a renderer, each counted once
+
+    renderer: the renderer whose screen and layers to count, if any"""
+    surfaces = {} # id -> surface, as the same image can be in more than one place
+    for rotations in assets.sprites.sprites.values():
+        for surface in rotations.values():
+            surfaces[id(surface)] = surface
+    for surface in effects.Flash_Effect.images.values():
+        surfaces[id(surface)] = surface
+    for name in ('screen', 'window', 'static_layer'):
+        surface = getattr(renderer, name, None)
+        if surface is not None:
+            surfaces[id(surface)] = surface
+    return len(surfaces), sum(surface_bytes(surface) for surface in surfaces.values())
+
+def world_bytes(world):
+    """Get roughly how many bytes a world holds: its actors, indexes and
+    arrays. The images, cells and screen it shares are not counted."""
+    size = sys.getsizeof
+    total = size(world) + size(world.actors) + size(world.npcs)
+    for actor in world.actors:
+        total += size(actor)
+    total += size(world.player)
+    total += size(world.tiles.types)
+    occupancy = world.occupancy
+    total += size(occupancy.cells) + size(occupancy.obstacles) + size(occupancy.deadly)
+    for here in occupancy.cells.values():
+        total += size(here)
+    flow_field = world.flow_field
+    if flow_field is not None and flow_field.distances is not None:
+        total += size(flow_field.distances) + size(flow_field.unreached)
+    view = world.visibility
+    if view is not None and view.seen is not None:
+        total += size(view.seen)
+        for octants, opaque in view.static_views.values():
+            total += size(opaque)
+            for indices, cells in octants:
+                total += size(indices) + size(cells) + sum(size(cell) for cell in cells)
+    if world.grid_state is not None:
+        for name in ('tile', 'obstacle', 'static_deadly', 'grunt_at', 'deadly'):
+            total += getattr(world.grid_state, name).nbytes
+    return total
+
+def report(world):
+    """Describe the memory a game is holding on to while in a world"""
+    live = count_live()
+    surfaces, pixels = shared_surfaces(world.renderer)
+    return {
+        'level': world.level,
+        'actors': len(world.actors),
+        'live_actors': sum(count for name, count in live.items() if name not in ('Init_World', 'Update')),
+        'live_worlds': live.get('Init_World', 0),
+        'pooled_npcs': len(spawner.pool),
+        'surfaces': surfaces,
+        'surface_kib': pixels // 1024,
+        'world_kib': world_bytes(world) // 1024,
+        'traced_kib': tracemalloc.get_traced_memory()[0] // 1024 if tracemalloc.is_tracing() else 0,
+    }
+
+class Memory_Tracker():
+    """Reports on the memory held after each room, and what changed since
+    the last room if tracemalloc snapshots are kept. Only the report the
+    growth is measured from and the last one are kept, the rest are
+    written out as they come, so the tracker itself does not grow."""
+    def __init__(self, diffs=False, path=None, warmup=WARMUP_ROOMS):
+        """Initialize the tracker, starting tracemalloc if it is not running
+        diffs: take a tracemalloc snapshot each room to diff with the last
+        path: CSV file to write the report of each room to, if any
+        warmup: rooms before the memory is expected to stay flat"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.diffs = diffs
+        self.warmup = warmup
+        self.rooms = 0 # the number of rooms reported on
+        self.baseline = None # the report after the warm up rooms
+        self.last = None # the latest report
+        self.last_snapshot = None
+        self.file = None
+        self.writer = None
+        if path is not None:
+            self.file = open(path, 'w', newline='')
+
+    def room(self, world):
+        """Record the memory held now the game is in a new room. Returns the
+        report, and the top tracemalloc differences since the last room if
+        keeping diffs."""
+        gc.collect() # only count what is really still reachable
+        room_report = report(world)
+        self.rooms += 1
+        if self.rooms == self.warmup + 1:
+            self.baseline = room_report
+        self.last = room_report
+        if self.file is not None:
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.file, fieldnames=list(room_report))
+                self.writer.writeheader()
+            self.writer.writerow(room_report)
+        difference = None
+        if self.diffs:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),)) # not the snapshots themselves
+            if self.last_snapshot is not None:
+                difference = snapshot.compare_to(self.last_snapshot, 'lineno')
+            self.last_snapshot = snapshot
+        return room_report, difference
+
+    def growth(self):
+        """Get how many KiB the memory in use grew by after the warm up rooms"""
+        if self.baseline is None:
+            return 0
+        return self.last['traced_kib'] - self.baseline['traced_kib']
+
+    def close(self):
+        """Finish writing the reports"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def play_rooms(rooms, seed, ticks, tracker, every):
+    """Play rooms headless, going through the door of each after some ticks
+    whether it is cleared or not, and report the memory after each
+
+    every: print every this many rooms"""
+    played = game.Game(seed=seed, headless=True)
+    for room in range(rooms):
+        for tick in range(ticks):
+            played.tick() # the player stands still, so may be killed
+        played.next_room()
+        room_report, difference = tracker.room(played.world)
+        if (room + 1) % every == 0 or room + 1 == rooms:
+            print('room %d: ' % (room + 1) + '  '.join('%s %s' % item for item in room_report.items()))
+            if difference:
+                for line in difference[:DIFF_LINES]:
+                    print('    %s' % line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the memory held stays flat from room to room')
+    parser.add_argument('--rooms', type=int, default=1000, help='number of rooms to play')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the rooms')
+    parser.add_argument('--ticks', type=int, default=10, help='ticks to play in each room')
+    parser.add_argument('--every', type=int, default=100, help='rooms between printed reports')
+    parser.add_argument('--tolerance', type=int, default=TOLERANCE,
+                        help='KiB the memory in use may grow by after the first %d rooms' % WARMUP_ROOMS)
+    parser.add_argument('--diff', action='store_true', help='print where the memory grew between rooms')
+    parser.add_argument('--csv', help='file to write the report of each room to')
+    args = parser.parse_args(argv)
+
+    tracker = Memory_Tracker(args.diff, args.csv)
+    play_rooms(args.rooms, args.seed, args.ticks, tracker, args.every)
+    tracker.close()
+    if args.csv:
+        print('memory report written to %s' % args.csv)
+    last = tracker.last
+    failed = False
+    if tracker.growth() > args.tolerance:
+        print('memory grew by %d KiB after the first %d rooms' % (tracker.growth(), WARMUP_ROOMS))
+        failed = True
+    if last['live_worlds'] > 1:
+        print('%d worlds are alive, old rooms are being kept' % last['live_worlds'])
+        failed = True
+    if last['live_actors'] > last['actors'] + last['pooled_npcs'] + 2: # the player and a sword
+        print('%d actors are alive, old rooms are being kept' % last['live_actors'])
+        failed = True
+    if failed:
+        sys.exit(1)
+    print('memory stayed flat over %d rooms' % args.rooms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+from collections import deque
+import tiles
+
+DIRECTIONS = ('up', 'left', 'down', 'right') # the order ties are broken in
+STEPS = {'up': (0, -1), 'left': (-1, 0), 'down': (0, 1), 'right': (1, 0)}
+UNREACHABLE = -1 # distance of a cell the player can not be reached from
+BLOCKED = -2 # distance of a cell with a static obstacle in it
+SEARCH_RADIUS = 16 # cells from the player the search goes, past the edge of the usual 15 cell screen
+
+class Flow_Field():
+    """Distance from every cell near the player to them, shared by all of
+    the npcs chasing them, so each npc finds its next step with a lookup
+    instead of a search of its own.
+
+    The distances only go around static obstacles, ie walls and hills, and
+    are worked out again when the player moves or the tiles change. Npcs
+    in the way are stepped around when choosing a step. Only the cells up
+    to SEARCH_RADIUS from the player are searched, so the cost does not
+    depend on the size of the world; npcs further away step straight
+    towards the player instead."""
+    def __init__(self, world, radius=SEARCH_RADIUS):
+        """Initialize the flow field. Nothing is worked out until a step
+        is asked for.
+
+        world: the world to find paths in
+        radius: the furthest cells from the player to search, across or down"""
+        self.world = world
+        self.radius = radius
+        self.width = world.width
+        self.height = world.height
+        self.left = 0 # the first column and row of the world searched
+        self.top = 0
+        self.columns = 0 # the number of columns and rows searched
+        self.rows = 0
+        # the cells searched are stored in flat lists with a blocked cell
+        # on every side, so the search never has to check the edges
+        self.stride = 2
+        self.offsets = None # the same order as DIRECTIONS
+        self.unreached = None # copied over the distances before each search
+        self.distances = None # made when first needed, most worlds have no chasers
+        self.blocked_version = None # the world's static_version when the blocked cells were found
+        self.target = None # the cell the distances lead to
+        self.queue = deque() # reused for each search
+
+    def _index(self, cell_coord):
+        """Get the index of a cell in the flat lists"""
+        return (cell_coord[0] - self.left + 1) * self.stride + cell_coord[1] - self.top + 1
+
+    def _in_window(self, cell_coord):
+        """Checks if a cell is one of the ones searched"""
+        return (0 <= cell_coord[0] - self.left < self.columns
+                and 0 <= cell_coord[1] - self.top < self.rows)
+
+    def _place_window(self, target):
+        """Move the cells searched to those around the target, cut off at
+        the edges of the world, and make the lists to fit"""
+        radius = self.radius
+        self.left = max(0, target[0] - radius)
+        self.top = max(0, target[1] - radius)
+        self.columns = max(0, min(self.width, target[0] + radius + 1) - self.left)
+        self.rows = max(0, min(self.height, target[1] + radius + 1) - self.top)
+        self.stride = self.rows + 2
+        self.offsets = (-1, -self.stride, 1, self.stride)
+        count = (self.columns + 2) * self.stride
+        if self.unreached is None or len(self.unreached) != count:
+            self.unreached = [BLOCKED] * count
+            self.distances = list(self.unreached)
+
+    def _find_blocked(self):
+        """Find the cells searched that are blocked by static obstacles.
+        Whichever is fewer is gone through, the tiles or the cells, so a
+        huge world costs no more than a small one."""
+        world = self.world
+        unreached = self.unreached
+        rows = self.rows
+        left = self.left
+        top = self.top
+        for x in range(left, left + self.columns):
+            start = self._index((x, top))
+            unreached[start:start + rows] = [UNREACHABLE] * rows
+        for cell_coord in self._cells_in_window(world.tiles.types):
+            if tiles.OBSTACLES[world.tiles.get(cell_coord)]:
+                unreached[self._index(cell_coord)] = BLOCKED
+        for cell_coord in self._cells_in_window(world.occupancy.obstacles):
+            for actor in world.occupancy.actors_at(cell_coord):
+                if actor.is_static and actor.is_obstacle:
+                    unreached[self._index(cell_coord)] = BLOCKED
+        if world.opening_position is not None and self._in_window(world.opening_position):
+            unreached[self._index(world.opening_position)] = BLOCKED # the way in counts as occupied
+        self.blocked_version = world.static_version
+
+    def _cells_in_window(self, cells):
+        """Get the cells searched that are in a dict keyed by cell,
+        going through the dict or the cells, whichever is fewer"""
+        left = self.left
+        top = self.top
+        right = left + self.columns
+        bottom = top + self.rows
+        if len(cells) < self.columns * self.rows:
+            return [cell_coord for cell_coord in cells
+                    if left <= cell_coord[0] < right and top <= cell_coord[1] < bottom]
+        return [(x, y) for x in range(left, right) for y in range(top, bottom) if (x, y) in cells]
+
+    def _search(self, target):
+        """Find the distance from every cell searched to the target, breadth first
+
+        target: the cell to find the distances to"""
+        distances = self.distances
+        distances[:] = self.unreached
+        self.target = target
+        offsets = self.offsets
+        queue = self.queue
+        queue.clear()
+        start = self._index(target)
+        distances[start] = 0 # even if the target is blocked, ie the player is in the door
+        queue.append(start)
+        while queue:
+            i = queue.popleft()
+            distance = distances[i] + 1
+            for offset in offsets:
+                j = i + offset
+                if distances[j] == UNREACHABLE: # neither found yet nor blocked
+                    distances[j] = distance
+                    queue.append(j)
+
+    def refresh(self):
+        """Work out the distances again if the player moved or the static
+        actors changed since they were last found"""
+        world = self.world
+        target = world.player.cell_coordinates
+        stale = self.blocked_version != world.static_version
+        if stale or target != self.target:
+            self._place_window(target)
+            self._find_blocked()
+            self._search(target)
+
+    def _lookup(self, cell_coord):
+        """Get the distance of a cell without refreshing, UNREACHABLE if
+        it is blocked, out of the world or further than the search goes"""
+        if not self._in_window(cell_coord):
+            return UNREACHABLE
+        distance = self.distances[self._index(cell_coord)]
+        if distance == BLOCKED:
+            return UNREACHABLE
+        return distance
+
+    def distance(self, cell_coord):
+        """Get the number of steps from a cell to the player, going around
+        static obstacles. UNREACHABLE if there is no way there, or none
+        that stays within SEARCH_RADIUS of the player."""
+        self.refresh()
+        return self._lookup(cell_coord)
+
+    def _straight_step(self, cell_coord):
+        """Get the direction of a free step straight towards the player,
+        along whichever way they are furthest first, for cells too far
+        away to have been searched. None if neither step is free."""
+        dx = self.target[0] - cell_coord[0]
+        dy = self.target[1] - cell_coord[1]
+        across = 'right' if dx > 0 else 'left'
+        down = 'down' if dy > 0 else 'up'
+        if abs(dx) > abs(dy) or (abs(dx) == abs(dy) and DIRECTIONS.index(across) < DIRECTIONS.index(down)):
+            directions = (across, down) if dy else (across,)
+        else:
+            directions = (down, across) if dx else (down,)
+        world = self.world
+        for direction in directions:
+            step = STEPS[direction]
+            cell = (cell_coord[0] + step[0], cell_coord[1] + step[1])
+            if world._is_in_grid(cell) and not world._is_occupied(cell):
+                return direction
+        return None
+
+    def next_step(self, cell_coord):
+        """Get the direction to step in to get closer to the player, or
+        None if there is no free step closer
+
+        cell_coord: the cell to step from"""
+        self.refresh()
+        if not self._in_window(cell_coord):
+            return self._straight_step(cell_coord)
+        here = self._lookup(cell_coord)
+        if here == UNREACHABLE:
+            return None
+        world = self.world
+        best = None
+        best_distance = here
+        for direction in DIRECTIONS:
+            dx, dy = STEPS[direction]
+            cell = (cell_coord[0] + dx, cell_coord[1] + dy)
+            distance = self._lookup(cell)
+            if distance != UNREACHABLE and distance < best_distance and not world._is_occupied(cell):
+                best = direction
+                best_distance = distance
+        return best
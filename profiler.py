@@ -0,0 +1,206 @@
+import time
+from array import array
+import pygame
+
+# the phases of a frame that are timed
+PHASES = ('events', 'npc_actions', 'check_clear', 'input',
+          'draw_background', 'draw_actors', 'draw_effects', 'display_update')
+HUD_COLOR = (255, 255, 255)
+HUD_BACKGROUND = (0, 0, 0)
+HUD_REFRESH = 15 # frames between updates of the numbers on the HUD
+
+def percentile(values, percent):
+    """Get a percentile of some values, 0 if there are none"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+class Frame_Profiler():
+    """Times each phase of every frame into a fixed size ring buffer. Does
+    close to nothing while disabled."""
+    def __init__(self, size=600):
+        """Initialize the profiler.
+        size: the number of frames to remember"""
+        self.enabled = False
+        self.show_hud = False
+        self.size = size
+        self.frame_times = array('d', [0.0]) * size # seconds of work in each frame
+        self.frame_intervals = array('d', [0.0]) * size # seconds from the start of one frame to the next
+        self.frame_ticks = array('l', [0]) * size # ticks run in each frame
+        self.frame_actors = array('l', [0]) * size # actors in the world in each frame
+        self.frame_ai_backlog = array('l', [0]) * size # npc turns the AI scheduler owed after each frame
+        self.frame_ai_lap = array('l', [0]) * size # ticks the AI scheduler's last pass over the npcs took
+        self.frame_input_wait = array('l', [0]) * size # milliseconds the oldest key press waited for a tick
+        self.phase_times = {} # phase -> seconds spent in that phase in each frame
+        for phase in PHASES:
+            self.phase_times[phase] = array('d', [0.0]) * size
+        self.current = dict.fromkeys(PHASES, 0.0) # seconds spent in each phase this frame
+        self.index = 0 # the slot for the next frame
+        self.count = 0 # the number of slots filled
+        self.frame_start = None
+        self.interval = 0.0
+        self.ticks = 0
+        self.input_wait = 0 # the longest a key press waited for a tick this frame
+        self.font = None
+        self.hud = None # the HUD drawn from the last numbers
+        self.hud_age = 0 # frames since the HUD numbers were updated
+        self.hud_size = (0, 0) # only grows, so a new HUD always covers the last one
+
+    def start(self):
+        """Start timing a phase. Pass the result to stop."""
+        if self.enabled:
+            return time.perf_counter()
+        return 0.0
+
+    def stop(self, phase, started):
+        """Stop timing a phase
+
+        phase: the name of the phase
+        started: what start returned"""
+        if self.enabled and started:
+            self.current[phase] += time.perf_counter() - started
+
+    def count_tick(self):
+        """Count a game logic tick in this frame"""
+        if self.enabled:
+            self.ticks += 1
+
+    def press_waited(self, milliseconds):
+        """Record how long a key press waited before a tick acted on it"""
+        if self.enabled and milliseconds > self.input_wait:
+            self.input_wait = milliseconds
+
+    def begin_frame(self):
+        """Start timing a frame"""
+        if not self.enabled:
+            self.frame_start = None
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.interval = now - self.frame_start
+        self.frame_start = now
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        self.ticks = 0
+        self.input_wait = 0
+
+    def end_frame(self, actor_count, scheduler=None):
+        """Store the times for this frame in the ring buffer
+
+        actor_count: the number of actors in the world
+        scheduler: the world's AI scheduler, to record how far behind it is"""
+        if not self.enabled or self.frame_start is None:
+            return
+        i = self.index
+        self.frame_times[i] = time.perf_counter() - self.frame_start
+        self.frame_intervals[i] = self.interval
+        self.frame_ticks[i] = self.ticks
+        self.frame_actors[i] = actor_count
+        self.frame_input_wait[i] = self.input_wait
+        if scheduler is not None:
+            self.frame_ai_backlog[i] = scheduler.backlog
+            self.frame_ai_lap[i] = scheduler.lap_ticks
+        for phase in PHASES:
+            self.phase_times[phase][i] = self.current[phase]
+        self.index = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _recent(self, values):
+        """Get the filled slots of a ring buffer, oldest first"""
+        if self.count < self.size:
+            return list(values[:self.count])
+        return list(values[self.index:]) + list(values[:self.index])
+
+    def summary(self):
+        """Get the statistics for the remembered frames. Times are in
+        milliseconds."""
+        frame_ms = [seconds * 1000 for seconds in self._recent(self.frame_times)]
+        elapsed = sum(self.frame_intervals[:self.count])
+        last = (self.index - 1) % self.size
+        summary = {
+            'frames': self.count,
+            'p50': percentile(frame_ms, 50),
+            'p95': percentile(frame_ms, 95),
+            'p99': percentile(frame_ms, 99),
+            'actors': self.frame_actors[last] if self.count else 0,
+            'ai_backlog': self.frame_ai_backlog[last] if self.count else 0,
+            'ai_lap': self.frame_ai_lap[last] if self.count else 0,
+            'input_wait': max(self.frame_input_wait[:self.count]) if self.count else 0,
+            'tick_rate': sum(self.frame_ticks[:self.count]) / elapsed if elapsed else 0.0,
+            'frame_rate': self.count / elapsed if elapsed else 0.0,
+        }
+        for phase in PHASES:
+            summary[phase] = sum(self.phase_times[phase][:self.count]) * 1000 / max(self.count, 1)
+        return summary
+
+    def dump(self, path):
+        """Write the remembered frames to a CSV file, times in milliseconds.
+        Returns False without writing if no frames have been profiled.
+
+        path: the file to write"""
+        if not self.count:
+            return False
+        columns = [self._recent(self.frame_times), self._recent(self.frame_intervals),
+                   self._recent(self.frame_ticks), self._recent(self.frame_actors),
+                   self._recent(self.frame_ai_backlog), self._recent(self.frame_ai_lap),
+                   self._recent(self.frame_input_wait)]
+        for phase in PHASES:
+            columns.append(self._recent(self.phase_times[phase]))
+        with open(path, 'w') as file:
+            file.write(','.join(('frame_ms', 'interval_ms', 'ticks', 'actors', 'ai_backlog', 'ai_lap_ticks',
+                                 'input_wait_ms')
+                                + PHASES) + '\n')
+            for row in zip(*columns):
+                values = ['%.3f' % (row[0] * 1000), '%.3f' % (row[1] * 1000)] + [str(count) for count in row[2:7]]
+                values += ['%.3f' % (seconds * 1000) for seconds in row[7:]]
+                file.write(','.join(values) + '\n')
+        return True
+
+    def toggle_hud(self):
+        """Show or hide the HUD, profiling only while it is shown. The
+        frames profiled are kept once it is hidden, so can still be dumped."""
+        self.show_hud = not self.show_hud
+        self.enabled = self.show_hud
+        self.hud = None
+        self.hud_size = (0, 0)
+        if self.show_hud:
+            self.count = 0 # start the numbers afresh
+            self.index = 0
+
+    def _make_hud(self):
+        """Draw the HUD text onto a surface"""
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 18)
+        summary = self.summary()
+        lines = [
+            'frame ms p50 %.2f  p95 %.2f  p99 %.2f' % (summary['p50'], summary['p95'], summary['p99']),
+            'actors %d  ticks/s %.1f  fps %.1f' % (summary['actors'], summary['tick_rate'], summary['frame_rate']),
+            'ai behind %d turns  lap %d ticks' % (summary['ai_backlog'], summary['ai_lap']),
+            'input waited up to %d ms' % summary['input_wait'],
+        ]
+        for phase in PHASES:
+            lines.append('%-16s %.3f ms' % (phase, summary[phase]))
+        rendered = [self.font.render(line, True, HUD_COLOR) for line in lines]
+        width = max(max(line.get_width() for line in rendered) + 8, self.hud_size[0])
+        height = max(sum(line.get_height() for line in rendered) + 8, self.hud_size[1])
+        self.hud_size = (width, height)
+        hud = pygame.Surface(self.hud_size)
+        hud.fill(HUD_BACKGROUND)
+        y = 4
+        for line in rendered:
+            hud.blit(line, (4, y))
+            y += line.get_height()
+        return hud
+
+    def draw_hud(self, surface):
+        """Draw the HUD in the corner of a surface. Returns the area drawn."""
+        self.hud_age += 1
+        if self.hud is None or self.hud_age >= HUD_REFRESH:
+            self.hud = self._make_hud()
+            self.hud_age = 0
+        return surface.blit(self.hud, (0, 0))
+
+frames = Frame_Profiler() # the shared profiler
@@ -0,0 +1,304 @@
+import pygame
+import assets
+import profiler
+import tiles
+
+BACKGROUND = (252, 216, 169) # the beige from the legend of zelda games
+BORDER = (0, 0, 0) # around the picture when it does not fill a fullscreen display
+
+class Null_Renderer():
+    """Renderer for running without a display. Nothing is drawn, so the
+    game logic can run as fast as it likes."""
+    headless = True
+    scale = 1
+
+    def open(self, screen_size):
+        """There is no window to open"""
+        return None
+
+    def render(self, world, alpha=1.0):
+        """There is nothing to draw"""
+        pass
+
+    def invalidate(self):
+        """There is nothing to redraw"""
+        pass
+
+    def display_surface(self):
+        """There is no window to draw on"""
+        return None
+
+class Screen_Renderer():
+    """Renderer that redraws the whole screen every frame.
+
+    The window can be a whole number of times bigger than the screen size
+    asked for, with every cell that much bigger. The images are scaled up
+    to fit once, when they are first used, so they look drawn at a low
+    resolution but nothing is scaled per frame."""
+    headless = False
+
+    def __init__(self, scale=1, fullscreen=False):
+        """Initialize the renderer
+        scale: how many times bigger than the screen size to make the window
+        fullscreen: fill the display, scaled up as far as a whole number fits"""
+        self.screen = None # what is drawn on, the window itself unless it is centred on a bigger display
+        self.screen_size = None # the size the screen was asked for at, before scaling up
+        self.scale = scale
+        self.fullscreen = fullscreen
+        self.window = None # the display
+        self.offset = None # where the screen is on the display, if not the whole of it
+        self.window_rects = [] # areas of the display to update this frame, reused every frame
+        self.tile_images = {} # (tile type, sprite size, scale) -> image, looked up once instead of per tile
+
+    def open(self, screen_size):
+        """Open the window. Returns the screen to draw on, the scale times
+        the size asked for.
+
+        screen_size: the size of the screen in pixels, before scaling up"""
+        if self.screen is not None and self.screen_size == screen_size:
+            return self.screen # reuse the window from the last room
+        pygame.init() # initialize the pygame module
+        assets.sprites.clear() # converted to the format of, and scaled for, any window before this one
+        self.tile_images.clear()
+        if self.fullscreen:
+            self.window = pygame.display.set_mode(pygame.display.get_desktop_sizes()[0], pygame.FULLSCREEN)
+        else:
+            self.window = pygame.display.set_mode((screen_size[0] * self.scale, screen_size[1] * self.scale))
+        window_size = self.window.get_size() # the display may not give the size asked for
+        # as far up as a whole number fits, so every pixel of the images becomes a square of the same size
+        self.scale = max(1, min(window_size[0] // screen_size[0], window_size[1] // screen_size[1]))
+        scaled_size = (screen_size[0] * self.scale, screen_size[1] * self.scale)
+        self.screen_size = screen_size
+        if scaled_size == window_size:
+            self.screen = self.window
+            self.offset = None
+        else: # centered, as the display is not a whole number bigger
+            self.window.fill(BORDER)
+            self.offset = ((window_size[0] - scaled_size[0]) // 2, (window_size[1] - scaled_size[1]) // 2)
+            self.screen = self.window.subsurface(pygame.Rect(self.offset, scaled_size))
+        return self.screen
+
+    def display_surface(self):
+        """Get the surface on the display, ie to draw the HUD on"""
+        return self.window
+
+    def _present(self, rects=None):
+        """Show what was drawn on the screen
+
+        rects: the areas of the screen that changed, all of it if None"""
+        if rects is None:
+            pygame.display.update()
+        elif self.offset is None:
+            pygame.display.update(rects)
+        else: # moved to where the screen is on the display
+            update = self.window_rects
+            update.clear()
+            for rect in rects:
+                update.append(rect.move(self.offset))
+            pygame.display.update(update)
+
+    def _draw_background(self, surface):
+        """Sets the background color"""
+        surface.fill(BACKGROUND)
+
+    def _draw_tile(self, surface, world, cell_coord, tile, origin=None):
+        """Draws a tile in its cell
+
+        origin: the pixel position of the top left of the surface in the world"""
+        key = (tile, world.sprite_size, world.scale)
+        image = self.tile_images.get(key)
+        if image is None:
+            image = self.tile_images[key] = tiles.image(tile, world.sprite_size, world.scale)
+        x, y = world.cells[cell_coord].draw_position
+        if origin is not None:
+            x -= origin[0]
+            y -= origin[1]
+        surface.blit(image, (x, y))
+
+    def _draw_tiles(self, surface, world):
+        """Draws every tile of a world"""
+        for cell_coord, tile in world.tiles.items():
+            self._draw_tile(surface, world, cell_coord, tile)
+
+    def render(self, world, alpha=1.0):
+        """Draws the world
+
+        world: the world to draw
+        alpha: how far between the last tick and the next to draw moving actors"""
+        frames = profiler.frames
+        started = frames.start()
+        self._draw_background(self.screen)
+        frames.stop('draw_background', started)
+        started = frames.start()
+        self._draw_tiles(self.screen, world)
+        for actor in world.actors: # itterate through each actor
+            actor.draw(self.screen, alpha) # draw each actor
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        for effect in world.effects:
+            effect.draw(self.screen, world, alpha)
+        frames.stop('draw_effects', started)
+        started = frames.start()
+        world.player.draw(self.screen, alpha)
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        self._present()
+        frames.stop('display_update', started)
+
+    def invalidate(self):
+        """Redraw everything next frame, the whole screen is redrawn every
+        frame anyway"""
+        pass
+
+class Dirty_Rect_Renderer(Screen_Renderer):
+    """Renderer that draws the background and the tiles once per room,
+    then only redraws the parts of the screen that change"""
+    def __init__(self, scale=1, fullscreen=False):
+        """Initialize the renderer. Takes the same arguments as Screen_Renderer."""
+        super(Dirty_Rect_Renderer, self).__init__(scale, fullscreen)
+        self.static_layer = None # background, tiles and static actors
+        self.static_world = None # the world the static layer was drawn for
+        self.static_version = None # the version of the world's tiles and static actors drawn
+        self.erase_rects = [] # areas drawn over by moving actors last frame
+        self.drawn_rects = [] # areas drawn over by moving actors this frame
+        self.update_rects = [] # areas of the display to update this frame
+        # the lists and rects are reused every frame so drawing makes no garbage
+
+    def _draw_static_layer(self, world):
+        """Draws the background, the tiles and the actors that never move
+        onto a surface that is kept until they change"""
+        layer = pygame.Surface(self.screen.get_size()).convert()
+        self._draw_background(layer)
+        self._draw_tiles(layer, world)
+        for actor in world.actors:
+            if actor.is_static:
+                actor.draw(layer)
+        self.static_layer = layer
+        self.static_world = world
+        self.static_version = world.static_version
+
+    def _copy_rect(self, rects, count, rect):
+        """Copy a rect into a list of rects, reusing the rect already there.
+        Returns the number of rects in use."""
+        if rect is None: # nothing was drawn
+            return count
+        if count < len(rects):
+            rects[count].update(rect)
+        else:
+            rects.append(rect.copy())
+        return count + 1
+
+    def render(self, world, alpha=1.0):
+        """Draws the moving actors over the static layer and updates only
+        the areas of the screen that changed
+
+        world: the world to draw
+        alpha: how far between the last tick and the next to draw moving actors"""
+        frames = profiler.frames
+        started = frames.start()
+        update = self.update_rects
+        update.clear()
+        if world is not self.static_world or world.static_version != self.static_version:
+            self._draw_static_layer(world) # new room, or a tile changed
+            self.screen.blit(self.static_layer, (0, 0))
+            update.append(self.screen.get_rect())
+        else:
+            for rect in self.erase_rects: # erase the moving actors from last frame
+                self.screen.blit(self.static_layer, rect, rect)
+                update.append(rect)
+        frames.stop('draw_background', started)
+        started = frames.start()
+        drawn = self.drawn_rects
+        count = 0
+        for actor in world.actors:
+            if not actor.is_static:
+                count = self._copy_rect(drawn, count, actor.draw(self.screen, alpha))
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        for effect in world.effects: # erased next frame like the actors
+            count = self._copy_rect(drawn, count, effect.draw(self.screen, world, alpha))
+        frames.stop('draw_effects', started)
+        started = frames.start()
+        count = self._copy_rect(drawn, count, world.player.draw(self.screen, alpha))
+        del drawn[count:] # actors that have gone
+        update.extend(drawn)
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        self._present(update)
+        frames.stop('display_update', started)
+        self.erase_rects, self.drawn_rects = drawn, self.erase_rects
+
+    def invalidate(self):
+        """Redraw the whole screen next frame, ie after something else has
+        drawn on it"""
+        self.static_world = None
+
+class Camera_Renderer(Screen_Renderer):
+    """Renderer for worlds bigger than the screen. Only the cells the
+    world's camera can see are drawn, by looking up the actors in each of
+    them, so the cost of a frame does not depend on the size of the world.
+    The tiles on the screen are drawn once each time the camera moves."""
+    def __init__(self, scale=1, fullscreen=False):
+        """Initialize the renderer. Takes the same arguments as Screen_Renderer."""
+        super(Camera_Renderer, self).__init__(scale, fullscreen)
+        self.static_layer = None # background, tiles and static actors in view
+        self.static_key = None # the world, static_version and camera position the layer was drawn for
+
+    def _draw_static_layer(self, world):
+        """Draws the background, the tiles and the static actors in view
+        onto a surface that is kept until they change or the camera moves"""
+        view = world.camera
+        if self.static_layer is None or self.static_layer.get_size() != self.screen.get_size():
+            self.static_layer = pygame.Surface(self.screen.get_size()).convert()
+        layer = self.static_layer
+        self._draw_background(layer)
+        origin = view.pixel_origin
+        for x in range(view.x, view.x + view.width):
+            for y in range(view.y, view.y + view.height):
+                tile = world.tiles.get((x, y))
+                if tile != tiles.EMPTY:
+                    self._draw_tile(layer, world, (x, y), tile, origin)
+                for actor in world.actors_at((x, y)):
+                    if actor.is_static:
+                        actor.draw(layer, 1.0, origin)
+        self.static_key = (world, world.static_version, view.x, view.y)
+
+    def render(self, world, alpha=1.0):
+        """Draws the moving actors in view over the static layer
+
+        world: the world to draw
+        alpha: how far between the last tick and the next to draw moving actors"""
+        frames = profiler.frames
+        view = world.camera
+        started = frames.start()
+        view.follow()
+        key = self.static_key
+        if (key is None or key[0] is not world or key[1] != world.static_version
+                or key[2] != view.x or key[3] != view.y):
+            self._draw_static_layer(world)
+        self.screen.blit(self.static_layer, (0, 0))
+        frames.stop('draw_background', started)
+        started = frames.start()
+        player = world.player
+        origin = view.pixel_origin
+        # one cell past each edge, for actors still moving in from there
+        for x in range(view.x - 1, view.x + view.width + 1):
+            for y in range(view.y - 1, view.y + view.height + 1):
+                for actor in world.actors_at((x, y)):
+                    if not actor.is_static and actor is not player:
+                        actor.draw(self.screen, alpha, origin)
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        for effect in world.effects: # few, so not worth looking up by cell
+            effect.draw(self.screen, world, alpha, origin)
+        frames.stop('draw_effects', started)
+        started = frames.start()
+        player.draw(self.screen, alpha, origin)
+        frames.stop('draw_actors', started)
+        started = frames.start()
+        self._present()
+        frames.stop('display_update', started)
+
+    def invalidate(self):
+        """Redraw the static layer next frame"""
+        self.static_key = None
@@ -0,0 +1,121 @@
+"""Replays a recorded session headless, as fast as possible.
+
+Record a session with "python game.py --record session.json", then run
+"python replay.py session.json" to play it back. The replay fails if the
+world does not end up the same as when it was recorded, and reports the
+ticks per second, so recordings work as both correctness checks and
+benchmarks."""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import controller
+import game
+
+class Recording():
+    """The seed of a session and the controller state of every tick, all
+    that is needed to play it again"""
+    def __init__(self, seed, level=1, ticks=None, final_hash=None, size=15):
+        """Initialize the recording.
+        seed: the seed the game was started with
+        level: the level the game was started on
+        ticks: the pressed list, direction and action of each tick
+        final_hash: the state hash of the game when recording stopped
+        size: the width and height of the rooms in cells"""
+        self.seed = seed
+        self.size = size
+        self.level = level
+        self.ticks = [] if ticks is None else ticks
+        self.final_hash = final_hash
+
+    def record(self, pressed, direction, action):
+        """Record the controller state of a tick
+
+        pressed: the directions and actions pressed since the last tick
+        direction: the direction held down, if any
+        action: the action held down, if any"""
+        self.ticks.append([list(pressed), direction, action]) # copied, the list is reused
+
+    def save(self, path, game):
+        """Write the recording to a file, with the state the game ended in"""
+        self.final_hash = state_hash(game)
+        with open(path, 'w') as file:
+            json.dump({'seed': self.seed, 'level': self.level, 'size': self.size, 'hash': self.final_hash,
+                       'ticks': self.ticks}, file)
+
+def load(path):
+    """Read a recording from a file"""
+    with open(path) as file:
+        data = json.load(file)
+    return Recording(data['seed'], data['level'], data['ticks'], data['hash'],
+                     data.get('size', 15)) # recordings from before rooms could be resized
+
+class Replay_Controller(controller.Player_Controller):
+    """Controller that plays back the recorded state of each tick"""
+    def __init__(self, ticks):
+        """Initialize the controller.
+        ticks: the recorded ticks to play back"""
+        super(Replay_Controller, self).__init__() # uses the __init__ method from Player_Controller()
+        self.ticks = ticks
+        self.index = 0 # the next tick to play back
+        self.no_input = [] # returned once the recording runs out
+
+    def take_pressed(self):
+        """Get what was pressed in the next recorded tick, and hold down
+        what was held then"""
+        if self.index >= len(self.ticks):
+            self.active_direction = None
+            self.active_action = None
+            return self.no_input
+        pressed, self.active_direction, self.active_action = self.ticks[self.index]
+        self.index += 1
+        return pressed
+
+def state_hash(game):
+    """Get a hash of everything that decides how a game carries on, to
+    check that a replay ended up where the recording did"""
+    world = game.world
+    player = world.player
+    state = [game.level, game.door_side, world.ticks, world.running, world.cleared,
+             player.cell_coordinates, player.facing]
+    for actor in world.actors:
+        state.append((type(actor).__name__, actor.cell_coordinates, actor.facing,
+                      getattr(actor, 'move_dir', None), getattr(actor, 'health', None)))
+    state.append(sorted(world.tiles.items())) # walls, hills and the door
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+def replay(recording):
+    """Play a recording back headless, with no frame rate limit. Returns
+    the game and the seconds it took."""
+    replayed = game.Game(level=recording.level, headless=True, seed=recording.seed,
+                         player_controller=Replay_Controller(recording.ticks), size=recording.size)
+    start = time.perf_counter()
+    game.run_game(replayed, len(recording.ticks))
+    return replayed, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recordings', nargs='+', help='recordings made with game.py --record')
+    parser.add_argument('--repeat', type=int, default=1, help='times to replay each recording, the fastest is kept')
+    args = parser.parse_args(argv)
+
+    recordings = [(path, load(path)) for path in args.recordings]
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # nothing is drawn
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # image paths are relative to the game
+    failed = 0
+    for path, recording in recordings:
+        best = None
+        for i in range(args.repeat):
+            replayed, seconds = replay(recording)
+            best = seconds if best is None else min(best, seconds)
+        matches = state_hash(replayed) == recording.final_hash
+        if not matches:
+            failed += 1
+        print('%-30s %8d ticks %10.1f ticks/s  %s' % (path, len(recording.ticks),
+              len(recording.ticks) / best if best else 0.0, 'ok' if matches else 'MISMATCH'))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
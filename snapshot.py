@@ -0,0 +1,196 @@
+"""Compact binary snapshots of worlds, for saving rooms and restoring them
+without generating them again.
+
+A snapshot is a header followed by the tiles and the npcs, each stored as
+arrays of numbers that are written and read in bulk. Files can hold any
+number of snapshots one after another, and are memory mapped when read,
+so a room is only unpacked when it is restored."""
+import array
+import mmap
+import struct
+import sys
+import actors
+import gameworld
+import spawner
+
+MAGIC = b'ROOM'
+VERSION = 1
+# magic, version, size of the whole snapshot in bytes, level, door side,
+# opening side (-1 for none), width, height, cell size, ticks, cleared,
+# running, player x, player y, player facing, number of tiles, number of npcs
+HEADER = struct.Struct('<4sHIihhiiHiBBiihII')
+NO_SIDE = -1 # the opening side of a room with no opening
+ACTOR_TYPES = { # type code -> the npc class and the image it is drawn with
+    1: (actors.Npc, 'images/npc2.jpg'),
+    2: (actors.Grunt, 'images/npc1.jpg'),
+    3: (actors.Chaser, 'images/npc1.jpg'),
+    4: (actors.Sentry, 'images/npc1.jpg'),
+}
+TYPE_CODES = dict((cls, code) for code, (cls, image) in ACTOR_TYPES.items())
+MOVE_DIRS = ('up', 'left', 'down', 'right') # index * 90 is the angle of the direction
+NO_MOVE_DIR = -1 # the move direction of an npc that has none
+# typecodes of the arrays after the header, the tiles' then the npcs'.
+# 'i' and 'h' are 4 and 2 bytes on every platform python runs on.
+TILE_ARRAYS = ('i', 'i', 'b') # x, y, tile type
+ACTOR_ARRAYS = ('b', 'i', 'i', 'b', 'h', 'b') # type code, x, y, facing / 90, health, move direction
+
+class Snapshot_Error(ValueError):
+    """Raised when bytes are not a snapshot this version can read"""
+
+def _write_array(parts, typecode, values):
+    """Add an array of numbers to the parts of a snapshot, little endian"""
+    values = array.array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    parts.append(values.tobytes())
+
+def _read_array(buffer, offset, typecode, count):
+    """Read an array of numbers from a snapshot. Returns the array and the
+    offset after it."""
+    values = array.array(typecode)
+    end = offset + values.itemsize * count
+    values.frombytes(buffer[offset:end])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values, end
+
+def dumps(world):
+    """Get a snapshot of a world as bytes: its tiles, npcs, player, door
+    and level. Swords in the middle of a swing are not kept."""
+    tile_cells = []
+    tile_types = []
+    for cell_coord, tile in world.tiles.items():
+        tile_cells.append(cell_coord)
+        tile_types.append(tile)
+    npcs = [npc for npc in world.npcs if type(npc) in TYPE_CODES]
+    columns = (
+        [cell[0] for cell in tile_cells],
+        [cell[1] for cell in tile_cells],
+        tile_types,
+        [TYPE_CODES[type(npc)] for npc in npcs],
+        [npc.cell_coordinates[0] for npc in npcs],
+        [npc.cell_coordinates[1] for npc in npcs],
+        [npc.facing // 90 for npc in npcs],
+        [npc.health for npc in npcs],
+        [MOVE_DIRS.index(npc.move_dir) if hasattr(npc, 'move_dir') else NO_MOVE_DIR for npc in npcs],
+    )
+    parts = []
+    for typecode, values in zip(TILE_ARRAYS + ACTOR_ARRAYS, columns):
+        _write_array(parts, typecode, values)
+    body = b''.join(parts)
+    player = world.player
+    opening_side = NO_SIDE if world.opening_side is None else world.opening_side
+    header = HEADER.pack(MAGIC, VERSION, HEADER.size + len(body), world.level, world.door_side,
+                         opening_side, world.width, world.height, world.cell_size // world.scale, world.ticks,
+                         world.cleared, world.running, player.cell_coordinates[0],
+                         player.cell_coordinates[1], player.facing, len(tile_cells), len(npcs))
+    return header + body
+
+def _read_header(buffer, offset):
+    """Read the header of the snapshot at an offset, checking it is one"""
+    if len(buffer) - offset < HEADER.size:
+        raise Snapshot_Error('truncated snapshot at byte %d' % offset)
+    header = HEADER.unpack_from(buffer, offset)
+    if header[0] != MAGIC:
+        raise Snapshot_Error('no snapshot at byte %d' % offset)
+    if header[1] != VERSION:
+        raise Snapshot_Error('snapshot version %d, only %d can be read' % (header[1], VERSION))
+    if offset + header[2] > len(buffer):
+        raise Snapshot_Error('truncated snapshot at byte %d' % offset)
+    return header
+
+def loads(buffer, offset=0, dirty_rects=True, headless=False, renderer=None, cells=None,
+          vectorized=False, view_size=None, ai_budget=None, scale=1, fullscreen=False):
+    """Rebuild a playable world from a snapshot, without generating it.
+    The other arguments are the same as for Init_World. The world uses the
+    shared random generator, as the seed it was generated from is not kept.
+
+    buffer: bytes, or anything else with the buffer protocol, ie a mmap
+    offset: where the snapshot starts in the buffer"""
+    (magic, version, size, level, door_side, opening_side, width, height, cell_size, ticks, cleared,
+     running, player_x, player_y, player_facing, tile_count, actor_count) = _read_header(buffer, offset)
+    position = offset + HEADER.size
+    columns = []
+    with memoryview(buffer) as view: # released straight away, so a mapped file can be closed
+        for typecode in TILE_ARRAYS:
+            values, position = _read_array(view, position, typecode, tile_count)
+            columns.append(values)
+        for typecode in ACTOR_ARRAYS:
+            values, position = _read_array(view, position, typecode, actor_count)
+            columns.append(values)
+    tile_x, tile_y, tile_type = columns[:3]
+
+    world = gameworld.Init_World.__new__(gameworld.Init_World) # skips generating the room
+    world._init_state(door_side, None if opening_side == NO_SIDE else opening_side, level, width, height,
+                      cell_size, dirty_rects, headless, renderer, cells, None, view_size, ai_budget,
+                      scale, fullscreen)
+    world.door_position = world._get_door_location(door_side)
+    if world.opening_side is None:
+        world.opening_position = None
+    else:
+        world.opening_position = world._get_door_location(world.opening_side)
+    world.tiles.update(zip(tile_x, tile_y), tile_type)
+    world.static_version += 1
+    world.player = actors.Player((player_x, player_y), world, './images/player.jpg')
+    world.player.turn(player_facing)
+    world._index_actor(world.player) # drawn separately, so not in world.actors
+    for code, x, y, facing, health, move_dir in zip(*columns[3:]):
+        cls, image = ACTOR_TYPES[code]
+        if issubclass(cls, actors.Grunt): # walks in a direction of its own
+            npc = spawner.pool.acquire(cls, (x, y), world, image, health, move_angle=move_dir * 90)
+        else:
+            npc = spawner.pool.acquire(cls, (x, y), world, image, health)
+        npc.turn(facing * 90)
+        world.add_actor(npc)
+    world._init_finish(vectorized)
+    world.ticks = ticks
+    world.cleared = bool(cleared)
+    world.running = bool(running)
+    return world
+
+def save(path, worlds):
+    """Write snapshots of worlds to a file, one after another"""
+    with open(path, 'wb') as file:
+        for world in worlds:
+            file.write(dumps(world))
+
+class Snapshot_File():
+    """A file of snapshots, memory mapped so opening it only reads where
+    each snapshot starts, and a room is only unpacked when it is restored"""
+    def __init__(self, path):
+        """Open the file and find the snapshots in it
+
+        path: a file written by save"""
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # an empty file can not be mapped
+            self.map = b''
+        self.offsets = [] # where each snapshot starts
+        offset = 0
+        while offset < len(self.map):
+            self.offsets.append(offset)
+            offset += _read_header(self.map, offset)[2]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def level(self, index):
+        """Get the level of a snapshot without restoring it"""
+        return _read_header(self.map, self.offsets[index])[3]
+
+    def restore(self, index, **world_options):
+        """Rebuild the world in a snapshot. Takes the same world options as loads."""
+        return loads(self.map, self.offsets[index], **world_options)
+
+    def close(self):
+        """Unmap and close the file"""
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,82 @@
+"""Waves of npcs that grow with the level, and the pool they are drawn from.
+
+Npcs that die, or are left behind in a room the player went through, go
+back to the pool and are spawned again in a later room, so a room with
+hundreds of npcs is set up without making hundreds of new objects."""
+import threading
+
+POOL_LIMIT = 5000 # most npcs of each class kept to reuse, the rest are left to be freed
+MAX_WAVE_FILL = 0.3 # most of the free cells of a room a wave may fill
+MAX_CHASER_TENTHS = 5 # most tenths of a wave that chase the player
+SENTRY_LEVEL = 4 # the first level with sentries
+
+class Npc_Pool():
+    """Npcs ready to be spawned again, kept by class. Rooms are built in
+    the background while npcs die in the room being played, so taking and
+    giving back are locked."""
+    def __init__(self, limit=POOL_LIMIT):
+        """Initialize an empty pool
+        limit: the most npcs of each class to keep"""
+        self.limit = limit
+        self.free = {} # npc class -> npcs ready to be spawned again
+        self.lock = threading.Lock()
+        self.created = 0 # npcs made because the pool had none, for profiling
+        self.reused = 0 # npcs taken from the pool
+
+    def acquire(self, cls, *args, **kwargs):
+        """Get an npc of a class, reused if the pool has one. Takes the same
+        arguments as the class."""
+        with self.lock:
+            free = self.free.get(cls)
+            npc = free.pop() if free else None
+            if npc is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if npc is None:
+            return cls(*args, **kwargs)
+        npc.__init__(*args, **kwargs) # set up like a new one, without making one
+        return npc
+
+    def release(self, npc):
+        """Give back an npc that has left its world, to be spawned again"""
+        npc.world = None # so the pool does not keep its room alive
+        with self.lock:
+            free = self.free.setdefault(type(npc), [])
+            if len(free) < self.limit:
+                free.append(npc)
+
+    def release_all(self, npcs):
+        """Give back every npc of a room that is done with"""
+        for npc in npcs:
+            self.release(npc)
+
+    def __len__(self):
+        return sum(len(free) for free in self.free.values())
+
+pool = Npc_Pool() # the shared pool
+
+def wave_size(level, free_count):
+    """Get the number of npcs in the wave of a level: 1, 2, 4, 7, 11 and so
+    on, into the hundreds, but never filling more than MAX_WAVE_FILL of
+    the room
+
+    free_count: the number of cells left free to spawn in"""
+    size = 1 + level * (level - 1) // 2
+    return max(1, min(size, int(free_count * MAX_WAVE_FILL)))
+
+def wave_mix(level, size):
+    """Split a wave into (npcs, grunts, sentries, chasers). Early levels
+    are only npcs that stand still; grunts come in from level 2, chasers
+    from level 3, until half of a wave chases the player, and from level
+    4 half of the grunts are sentries, which chase the player once they
+    see them. Each kind has at least one npc from its level on, as long as
+    the wave is big enough."""
+    chasers = size * max(0, min(level - 2, MAX_CHASER_TENTHS)) // 10
+    if level >= 3: # at least one, where a small wave would round them away
+        chasers = min(max(chasers, 1), size)
+    walkers = (size - chasers) * min(level - 1, 3) // 4
+    if level >= 2:
+        walkers = min(max(walkers, 1), size - chasers)
+    sentries = walkers // 2 if level >= SENTRY_LEVEL else 0
+    return size - walkers - chasers, walkers - sentries, sentries, chasers
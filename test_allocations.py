@@ -0,0 +1,34 @@
+"""Checks that steady-state frames allocate nothing they keep, the same as
+bench.py does but over fewer frames, so it only takes a few seconds.
+
+Run "python -m unittest test_allocations" from the game's directory."""
+import os
+import unittest
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # render offscreen, read when the window opens
+import bench
+
+WARMUP_FRAMES = 200 # frames before the allocations are expected to stay flat
+FRAMES = 200 # frames the allocations are checked over
+# blocks a frame may leave behind on average. Anything the game keeps every
+# frame is at least one block a frame, while pygame's display update keeps
+# up to a few dozen blocks now and then, which over this few frames is more
+# than bench.ALLOCATION_LIMIT allows.
+LIMIT = 0.5
+
+class Test_Allocations(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(__file__))) # image paths are relative to the game
+
+    def tearDown(self):
+        os.chdir(self.directory)
+
+    def test_frames_keep_nothing(self):
+        """Frames with grunts walking about leave no more than LIMIT
+        blocks allocated each"""
+        benchmark = bench.Benchmark([15], [0], 0, 1, 0)
+        blocks = benchmark.bench_allocations(WARMUP_FRAMES, FRAMES)
+        self.assertLessEqual(blocks, LIMIT)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Checks that finished rooms are let go of, the same as memory.py does but
+over fewer rooms, so it only takes a few seconds.
+
+Run "python -m unittest test_memory" from the game's directory."""
+import gc
+import os
+import unittest
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # nothing is drawn, but pygame is still imported
+import game
+import memory
+
+ROOMS = 100 # rooms played headless
+WARMUP_ROOMS = 10 # rooms before the surfaces are expected to stay the same
+TICKS = 10 # ticks played in each room
+
+class Test_Teardown(unittest.TestCase):
+    def test_rooms_are_let_go(self):
+        """After each room only its own world and actors are alive, besides
+        the pooled npcs, and the surfaces held stay the same"""
+        played = game.Game(seed=0, headless=True)
+        surfaces = None
+        for room in range(ROOMS):
+            for tick in range(TICKS):
+                played.tick() # the player stands still, so may be killed
+            played.next_room()
+            gc.collect() # only count what is really still reachable
+            report = memory.report(played.world)
+            self.assertEqual(report['live_worlds'], 1, 'room %d' % room)
+            self.assertLessEqual(report['live_actors'], report['actors'] + report['pooled_npcs'] + 2, # the player and a sword
+                                 'room %d' % room)
+            if room == WARMUP_ROOMS:
+                surfaces = report['surfaces']
+            elif room > WARMUP_ROOMS:
+                self.assertEqual(report['surfaces'], surfaces, 'room %d' % room)
+
+if __name__ == "__main__":
+    unittest.main()
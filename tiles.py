@@ -0,0 +1,61 @@
+import assets
+
+# tile types
+EMPTY = 0
+WALL = 1
+HILL = 2
+DOOR = 3
+OPEN_DOOR = 4
+
+IMAGES = { # tile type -> file path of its image
+    WALL: './images/wall.jpg',
+    HILL: './images/hill.jpg',
+    DOOR: './images/door.jpg',
+    OPEN_DOOR: './images/sludge.jpg',
+}
+OBSTACLES = (False, True, True, True, True) # indexed by tile type, whether it can be walked through
+
+class Tile_Grid():
+    """The static tiles of a world, ie walls, doors and hills, stored as a
+    tile type for each cell instead of an actor each. Only cells with a
+    tile are stored, so a huge world costs no more than its tiles, and the
+    cell a tile is in is the only record of where it is."""
+    def __init__(self):
+        """Initialize an empty grid"""
+        self.types = {} # cell coordinate -> tile type, for the cells that have a tile
+
+    def get(self, cell_coord):
+        """Get the tile type in a cell, EMPTY if there is none"""
+        return self.types.get(cell_coord, EMPTY)
+
+    def set(self, cell_coord, tile):
+        """Put a tile in a cell, replacing the one there. EMPTY clears it."""
+        if tile == EMPTY:
+            self.types.pop(cell_coord, None)
+        else:
+            self.types[cell_coord] = tile
+
+    def update(self, cell_coords, types):
+        """Put many tiles in at once, ie when restoring a snapshot
+
+        cell_coords: the cells to put the tiles in
+        types: the tile type for each cell, none of them EMPTY"""
+        self.types.update(zip(cell_coords, types))
+
+    def is_obstacle(self, cell_coord):
+        """Checks if the tile in a cell blocks it"""
+        return OBSTACLES[self.types.get(cell_coord, EMPTY)]
+
+    def items(self):
+        """Go through the (cell coordinate, tile type) of every tile"""
+        return self.types.items()
+
+    def __len__(self):
+        return len(self.types)
+
+def image(tile, size=None, scale=1):
+    """Get the image a tile type is drawn with, from the shared cache
+
+    size: pixels across to scale the image down to, as it is if None
+    scale: whole number to then scale the image up by"""
+    return assets.sprites.get(IMAGES[tile], size, scale)[0]
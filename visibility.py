@@ -0,0 +1,234 @@
+import tiles
+
+SIGHT_RADIUS = 8 # furthest cells the player can be seen from
+STATIC_CACHE_SIZE = 256 # player cells whose view past the walls and hills is kept, per room
+# the eight octants around the player, as the multipliers that turn a
+# (column, row) in the first octant into an (x, y) offset in each one
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+           (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1))
+
+class Visibility_Map():
+    """Which cells the player can be seen from, shared by all of the npcs
+    that look for them, so each npc finds out with a lookup instead of a
+    raycast of its own.
+
+    The cells are found by shadowcasting out from the player in each of
+    eight octants, blocked by walls, hills and doors and by the npcs in
+    the way. What can be seen past the walls and hills alone is kept for
+    each cell the player has been in, as it only changes when the tiles
+    do. Each tick only the npcs standing in that view are looked for, and
+    only the octants whose npcs moved have their shadows cast again.
+
+    Only the cells within the radius of the player are kept, in flat lists
+    the size of that square, so the cost does not depend on the size of
+    the world."""
+    def __init__(self, world, radius=SIGHT_RADIUS):
+        """Initialize the map. Nothing is worked out until a cell is
+        asked about.
+
+        world: the world to look in
+        radius: the furthest cells the player can be seen from"""
+        self.world = world
+        self.radius = radius
+        self.width = world.width
+        self.height = world.height
+        self.size = 2 * radius + 1 # cells across the square kept around the player
+        self.left = 0 # the first column and row of the world in the square
+        self.top = 0
+        self.opaque = None # whether each cell in the square blocks sight, kept with its static view
+        self.seen = None # the number of octants each cell in the square is seen in
+        self.static_version = None # the world's static_version when the views were worked out
+        # player cell -> the (indices, cells) seen in each octant past the
+        # walls and hills alone, and which cells of the square around it
+        # they block sight through. The indices are into that square, which
+        # is always the one in use while the player is in the cell.
+        self.static_views = {}
+        self.refreshed_tick = None # the world tick the view was last brought up to date on
+        self.target = None # the cell the player was in for the current view
+        self.views = [[] for octant in OCTANTS] # the indices seen in each octant now
+        self.blockers = [() for octant in OCTANTS] # the indices of the npcs in the way in each octant
+
+    def _index(self, cell_coord):
+        """Get the index of a cell in the flat lists"""
+        return (cell_coord[0] - self.left) * self.size + cell_coord[1] - self.top
+
+    def _in_square(self, cell_coord):
+        """Checks if a cell is in the square kept around the player"""
+        return 0 <= cell_coord[0] - self.left < self.size and 0 <= cell_coord[1] - self.top < self.size
+
+    def _cells_in_square(self, cells):
+        """Get the cells in the square that are in a dict keyed by cell,
+        going through the dict or the cells, whichever is fewer"""
+        left = self.left
+        top = self.top
+        right = left + self.size
+        bottom = top + self.size
+        if len(cells) < self.size * self.size:
+            return [cell_coord for cell_coord in cells
+                    if left <= cell_coord[0] < right and top <= cell_coord[1] < bottom]
+        return [(x, y) for x in range(left, right) for y in range(top, bottom) if (x, y) in cells]
+
+    def _move_square(self, target):
+        """Move the square to the cells around the player, making the
+        lists the first time
+
+        target: the cell the player is in"""
+        if self.seen is None:
+            self.seen = [0] * (self.size * self.size)
+        self.left = target[0] - self.radius
+        self.top = target[1] - self.radius
+
+    def _find_opaque(self):
+        """Find the cells in the square that walls, hills and doors block
+        sight through"""
+        world = self.world
+        opaque = bytearray(self.size * self.size)
+        for cell_coord in self._cells_in_square(world.tiles.types):
+            if tiles.OBSTACLES[world.tiles.get(cell_coord)] and world._is_in_grid(cell_coord):
+                opaque[self._index(cell_coord)] = True
+        for cell_coord in self._cells_in_square(world.occupancy.obstacles):
+            for actor in world.occupancy.actors_at(cell_coord):
+                if actor.is_static and actor.is_obstacle and world._is_in_grid(cell_coord):
+                    opaque[self._index(cell_coord)] = True
+        return opaque
+
+    def _cast(self, found, x, y, row, start, end, xx, xy, yx, yy):
+        """Find the cells seen in one octant, from a row out, between two
+        slopes, going round the shadow of each blocked run of cells
+
+        found: the list to add the index of each cell seen to
+        x, y: the cell the view is from
+        xx, xy, yx, yy: the multipliers for the octant"""
+        if start < end:
+            return
+        radius = self.radius
+        limit = radius * radius + radius # rounds the edge of the view
+        opaque = self.opaque
+        width = self.width
+        height = self.height
+        size = self.size
+        square_x = self.left # not left and top, which are the slopes of each cell below
+        square_y = self.top
+        new_start = start
+        for j in range(row, radius + 1):
+            blocked = False
+            dy = -j
+            for dx in range(-j, 1):
+                left = (dx - 0.5) / (dy + 0.5)
+                right = (dx + 0.5) / (dy - 0.5)
+                if start < right:
+                    continue
+                if end > left:
+                    break
+                cx = x + dx * xx + dy * xy
+                cy = y + dx * yx + dy * yy
+                if 0 <= cx < width and 0 <= cy < height:
+                    i = (cx - square_x) * size + cy - square_y
+                    if dx * dx + dy * dy <= limit:
+                        found.append(i)
+                    solid = opaque[i]
+                else: # past the edge of the world, ie through the opening
+                    solid = True
+                if blocked:
+                    if solid:
+                        new_start = right
+                    else:
+                        blocked = False
+                        start = new_start
+                elif solid and j < radius:
+                    blocked = True
+                    self._cast(found, x, y, j + 1, start, left, xx, xy, yx, yy)
+                    new_start = right
+            if blocked:
+                break
+
+    def _cast_octant(self, cell_coord, octant):
+        """Find the indices of the cells seen from a cell in one octant"""
+        found = []
+        self._cast(found, cell_coord[0], cell_coord[1], 1, 1.0, 0.0, *OCTANTS[octant])
+        return found
+
+    def _static_view(self, cell_coord):
+        """Get the indices and the cells seen in each octant from a cell
+        past the walls and hills alone, worked out once for each cell the
+        player is in, and use the opaque cells of the square around it"""
+        entry = self.static_views.get(cell_coord)
+        if entry is None:
+            if len(self.static_views) >= STATIC_CACHE_SIZE: # forget the oldest
+                del self.static_views[next(iter(self.static_views))]
+            self.opaque = self._find_opaque()
+            size = self.size
+            left = self.left
+            top = self.top
+            view = []
+            for octant in range(len(OCTANTS)):
+                indices = self._cast_octant(cell_coord, octant)
+                view.append((indices, [(left + i // size, top + i % size) for i in indices]))
+            entry = self.static_views[cell_coord] = (view, self.opaque)
+        self.opaque = entry[1]
+        return entry[0]
+
+    def _find_blockers(self, indices, cells):
+        """Get the indices of the cells in an octant with an npc in the way"""
+        obstacles = self.world.occupancy.obstacles
+        blockers = [i for i, cell_coord in zip(indices, cells) if cell_coord in obstacles]
+        grid_state = self.world.grid_state
+        if grid_state is not None: # grunts are only in the grid state
+            blockers += [i for i, cell_coord in zip(indices, cells) if grid_state.grunt_in(cell_coord) is not None]
+        return tuple(blockers)
+
+    def _set_view(self, octant, view):
+        """Replace what is seen in an octant"""
+        seen = self.seen
+        for i in self.views[octant]:
+            seen[i] -= 1
+        for i in view:
+            seen[i] += 1
+        self.views[octant] = view
+
+    def refresh(self):
+        """Bring the view up to date once a tick: work out the view past
+        the walls and hills if the player moved or the tiles changed, then
+        cast the npcs' shadows again in each octant whose npcs are not the
+        same as last time"""
+        world = self.world
+        if self.refreshed_tick == world.ticks and self.static_version == world.static_version:
+            return
+        self.refreshed_tick = world.ticks
+        target = world.player.cell_coordinates
+        moved = self.static_version != world.static_version or target != self.target
+        if self.static_version != world.static_version: # the views past the walls and hills are out of date
+            self.static_views.clear()
+            self.static_version = world.static_version
+        if moved:
+            self._move_square(target)
+        self.target = target
+        if not world._is_in_grid(target): # out through the door, nothing can see them
+            for octant in range(len(OCTANTS)):
+                self._set_view(octant, [])
+                self.blockers[octant] = ()
+            return
+        view = self._static_view(target)
+        opaque = self.opaque
+        for octant, (indices, cells) in enumerate(view):
+            blockers = self._find_blockers(indices, cells)
+            if not moved and blockers == self.blockers[octant]:
+                continue # nothing in sight in this octant has changed
+            self.blockers[octant] = blockers
+            if not blockers:
+                self._set_view(octant, indices)
+                continue
+            for i in blockers: # the npcs in the way cast shadows of their own
+                opaque[i] += 2
+            self._set_view(octant, self._cast_octant(target, octant))
+            for i in blockers: # put back, the walls and hills stay as they were
+                opaque[i] -= 2
+
+    def can_see(self, cell_coord):
+        """Check if the player can be seen from a cell, and so can see it"""
+        self.refresh()
+        if not self.world._is_in_grid(cell_coord):
+            return False
+        if cell_coord == self.target:
+            return True
+        return self._in_square(cell_coord) and self.seen[self._index(cell_coord)] > 0